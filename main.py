@@ -1,18 +1,41 @@
 import sys
-from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox, QPushButton, QDialog, QVBoxLayout, QTextEdit, QLabel, QInputDialog, QDialogButtonBox, QListWidget, QListWidgetItem, QHBoxLayout
+from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox, QPushButton, QDialog, QVBoxLayout, QTextEdit, QLabel, QInputDialog, QDialogButtonBox, QListWidget, QListWidgetItem, QHBoxLayout, QFormLayout, QDoubleSpinBox, QSpinBox
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile, QThread, Signal, Qt, QObject
+from PySide6.QtCore import QFile, QThread, Signal, Qt, QObject, QTimer
 import os
 import subprocess
 import webbrowser
-from yolo.detector import YOLODetector
+from yolo.detector import DEFAULT_SETTINGS
+from yolo.models import ModelCache
+from yolo.backends import BACKENDS, available_backends, runtime_installed, is_exported, export_model
+from yolo.pipeline import FramePipeline
+from yolo.counting import (filter_detections, count_detections, draw_detections, draw_regions, draw_roi, draw_counts,
+                           is_count_event, format_totals)
+from yolo.recorder import VideoRecorder, EventClipRecorder
+from yolo.store import CountStore, CheckpointedCounts
+from yolo.server import LiveServer
+from yolo.autotune import MODEL_MAP, TuneStore, DriftMonitor, MonitoredDetector, tuned_profile
+from yolo.benchmark import synthetic_clip, video_clip
+from yolo.weights import YOLO_WEIGHT_URLS, WeightManager
+from yolo.tiling import TiledDetector
+from yolo.cache import DetectionCache
+from yolo.checkpoint import checkpoint_for, seek_capture
+from yolo.capture import open_capture
+from yolo.motion import MotionGate, GatedDetector
+from yolo.tracker import TrackingCounter, LineCounter, ZoneCounter
+from yolo.live import LatestFrameGrabber
+from yolo.metrics import metrics, MetricsExporter
+from yolo.display import DisplayView, LatestFrameSlot, render_view, display_to_frame
 import threading
-import requests
+import importlib.util
+import logging
 import cv2
 from PySide6.QtGui import QImage, QPixmap
 import time
 import numpy as np
 
+log = logging.getLogger("objshomar")
+
 YOLO_MODELS = [
     ("yolov8n.pt", "Nano (fastest, smallest)"),
     ("yolov8s.pt", "Small (fast, good accuracy)"),
@@ -20,15 +43,108 @@ YOLO_MODELS = [
     ("yolov8l.pt", "Large (high accuracy, slow)"),
     ("yolov8x.pt", "X-Large (highest accuracy, slowest)")
 ]
-YOLO_DOWNLOAD_URLS = {
-    "yolov8l.pt": "https://github.com/ultralytics/assets/releases/download/v0.0.0/yolov8l.pt",
-    "yolov8x.pt": "https://github.com/ultralytics/assets/releases/download/v0.0.0/yolov8x.pt"
-}
+# How sources are opened: capture backend ('auto', 'ffmpeg', 'gstreamer' or 'pyav', which needs
+# the optional PyAV package), decoder threads (0: library default), capture buffer size (0: default),
+# hardware decoding when available, and DECODE_MAX_SIZE to downscale frames right after decoding
+# so the longer side is at most that many pixels (e.g. the model input size); None keeps full size.
+CAPTURE_BACKEND = 'auto'
+DECODER_THREADS = 0
+CAPTURE_BUFFER_SIZE = 0
+HW_DECODE = False
+DECODE_MAX_SIZE = None
+# Frames per model call when processing video files (live streams always use 1)
+VIDEO_FILE_BATCH_SIZE = 4
+# Seconds to wait for a batch to fill once its first frame is decoded
+VIDEO_FILE_BATCH_MAX_WAIT = 0.02
+# Depth of the capture/inference/emit queues for video files and what to do when they are
+# full ('block', 'drop_oldest' or 'drop_newest'). Blocking keeps every frame counted.
+VIDEO_FILE_QUEUE_SIZE = 8
+VIDEO_FILE_DROP_POLICY = 'block'
+# Camera links run in live mode: the model always gets the newest frame, grabbed after it became
+# free, and frames arriving meanwhile are dropped, which keeps latency at about one inference.
+# Seconds without a frame before the stream counts as ended:
+LIVE_READ_TIMEOUT = 10
+# Track objects across frames and keep cumulative totals. Counting lines are
+# (name, (x1, y1), (x2, y2)) and zones are (name, [(x, y), ...]) in source frame pixels.
+TRACKING_ENABLED = True
+COUNTING_LINES = []
+COUNTING_ZONES = []
+# Skip inference on frames where nothing moved (reusing the last detections); useful for
+# mostly idle cameras. MOTION_MAX_SKIP bounds how many frames in a row can be skipped.
+MOTION_GATING = False
+MOTION_METHOD = 'diff'
+MOTION_MAX_SKIP = 30
+# Sliced inference for high-resolution sources: frames are cut into overlapping TILE_SIZE tiles
+# that run as one batch, so small distant objects are not lost when downscaling to the model input
+TILED_INFERENCE = False
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2
+# On-disk cache of all-class detections for video files, keyed by video, weights and settings;
+# replaying a file (e.g. with a different class selection) skips inference. None disables it.
+DETECTION_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+DETECTION_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Video files save their position and tracking totals every CHECKPOINT_EVERY frames, and
+# when stopped, so re-opening an unfinished file can resume there. None disables it.
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), "checkpoints")
+CHECKPOINT_EVERY = 300
+# "Record" writes the annotated video (boxes and counts) under RECORDINGS_DIR on an encoder
+# thread: RECORD_MODE 'full' records everything, 'events' only short clips around count events.
+# Frames are dropped rather than slowing detection if encoding falls RECORD_QUEUE_SIZE frames behind.
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), "recordings")
+RECORD_MODE = 'full'
+RECORD_QUEUE_SIZE = 64
+EVENT_CLIP_PRE_SECONDS = 2
+EVENT_CLIP_POST_SECONDS = 3
+# Per-second counts of every source are kept in this SQLite file with minute/hour rollups
+# (query with "python -m yolo.cli query"). None disables it.
+COUNT_STORE_PATH = os.path.join(os.path.dirname(__file__), "counts.db")
+# Local server publishing live counts (JSON, Server-Sent Events, WebSocket) and annotated frames
+# (MJPEG) for dashboards, e.g. http://127.0.0.1:8765/streams/<name>/mjpeg. None disables it.
+LIVE_SERVER_PORT = None
+LIVE_SERVER_HOST = '127.0.0.1'
+LIVE_SERVER_JPEG_QUALITY = 80
+# "Auto" in the model list picks the most accurate downloaded model, input size and backend that
+# reach AUTO_TUNE_TARGET_FPS for AUTO_TUNE_STREAMS streams on this machine. Results are stored per
+# machine in AUTO_TUNE_PATH (shared with "python -m yolo.cli tune"). When the model later runs more
+# than AUTO_TUNE_DRIFT slower than measured, the result is marked stale and tuned again next time.
+# AUTO_TUNE_CLIP is a sample video to profile on (None: synthetic frames).
+AUTO_TUNE_TARGET_FPS = 15
+AUTO_TUNE_STREAMS = 1
+AUTO_TUNE_SIZES = [320, 480, 640]
+AUTO_TUNE_BACKENDS = ['pytorch']
+AUTO_TUNE_CLIP = None
+AUTO_TUNE_FRAMES = 60
+AUTO_TUNE_DRIFT = 0.3
+AUTO_TUNE_PATH = os.path.join(os.path.dirname(__file__), "autotune.json")
+# Loaded models kept in memory (warmed up) so switching engines back and forth is instant
+MODEL_CACHE_SIZE = 2
+# Pipeline metrics export: JSONL snapshots appended to a file and/or Prometheus text served
+# on http://127.0.0.1:<port>/metrics. Metrics stay disabled (near zero cost) unless one of
+# these is set or "Show Stats" is checked.
+METRICS_JSONL_PATH = None
+METRICS_HTTP_PORT = None
+METRICS_EXPORT_INTERVAL = 5
+# Level of the video thread's log messages on stderr (logging.DEBUG shows per-run details)
+LOG_LEVEL = logging.INFO
+YOLO_DOWNLOAD_URLS = dict(YOLO_WEIGHT_URLS)
+# Known sha256 of weights, checked before a weight is used. Weights not listed here are pinned in
+# yolo/weights.sha256 on their first verified download and checked against it afterwards.
+YOLO_WEIGHT_SHA256 = {}
+# Weights are looked up in these shared directories (e.g. a network share) and HTTP mirrors
+# (serving such a directory) before the URLs above; downloads are copied into the first
+# directory for other machines. Downloads use this many parallel ranged connections.
+WEIGHT_CACHE_DIRS = []
+WEIGHT_MIRRORS = []
+DOWNLOAD_CONNECTIONS = 4
 
 selected_model_path = None
+selected_backend = 'pytorch'
 selected_classes = set()
 
 def check_python_installed():
+    # The interpreter running this app is enough for installing requirements with pip
+    if sys.executable and os.path.exists(sys.executable):
+        return True
     for cmd in ["python", "python3"]:
         try:
             result = subprocess.run([cmd, "--version"], capture_output=True, text=True)
@@ -55,16 +171,8 @@ def show_python_required_dialog():
 
 def check_required_packages():
     required = ["PySide6", "cv2", "ultralytics", "numpy"]
-    missing = []
-    for pkg in required:
-        try:
-            if pkg == "cv2":
-                import cv2
-            else:
-                __import__(pkg)
-        except ImportError:
-            missing.append(pkg)
-    return missing
+    # find_spec only locates the packages; importing ultralytics/torch here would cost seconds
+    return [pkg for pkg in required if importlib.util.find_spec(pkg) is None]
 
 def prompt_install_requirements():
     msg = QMessageBox()
@@ -129,23 +237,21 @@ def install_requirements():
 class DownloadThread(QThread):
     log_signal = Signal(str)
     finished_signal = Signal(bool, str)
-    def __init__(self, url, dest):
+    def __init__(self, manager, model_name, url, sha256=None):
         super().__init__()
+        self.manager = manager
+        self.model_name = model_name
         self.url = url
-        self.dest = dest
+        self.sha256 = sha256
+        self._percent = -1
+    def progress(self, downloaded, total):
+        percent = downloaded * 100 // total if total else 0
+        if percent != self._percent:
+            self._percent = percent
+            self.log_signal.emit(f"Downloaded {percent}%...")
     def run(self):
-        import requests
         try:
-            r = requests.get(self.url, stream=True)
-            total = int(r.headers.get('content-length', 0))
-            with open(self.dest, 'wb') as f:
-                downloaded = 0
-                for chunk in r.iter_content(chunk_size=1024*1024):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        percent = downloaded * 100 // total if total else 0
-                        self.log_signal.emit(f"Downloaded {percent}%...")
+            self.manager.fetch(self.model_name, self.url, self.sha256, self.progress)
             self.log_signal.emit("Download complete.")
             self.finished_signal.emit(True, "Download complete.")
         except Exception as e:
@@ -153,8 +259,10 @@ class DownloadThread(QThread):
             self.finished_signal.emit(False, str(e))
 
 def download_yolo_weight(model_name, parent=None):
-    url = YOLO_DOWNLOAD_URLS[model_name]
-    dest = os.path.join(os.path.dirname(__file__), "yolo", model_name)
+    # Returns True once the verified weight is in place; an interrupted download resumes next time
+    manager = WeightManager(os.path.join(os.path.dirname(__file__), "yolo"), WEIGHT_CACHE_DIRS, WEIGHT_MIRRORS,
+                            connections=DOWNLOAD_CONNECTIONS)
+    result = {'success': False}
     dlg = QDialog(parent)
     dlg.setWindowTitle(f"Downloading {model_name}")
     layout = QVBoxLayout(dlg)
@@ -164,9 +272,10 @@ def download_yolo_weight(model_name, parent=None):
     layout.addWidget(label)
     layout.addWidget(log)
     dlg.setLayout(layout)
-    thread = DownloadThread(url, dest)
+    thread = DownloadThread(manager, model_name, YOLO_DOWNLOAD_URLS.get(model_name), YOLO_WEIGHT_SHA256.get(model_name))
     thread.log_signal.connect(log.append)
     def on_finished(success, msg):
+        result['success'] = success
         if success:
             log.append("Download finished successfully.")
         else:
@@ -175,8 +284,12 @@ def download_yolo_weight(model_name, parent=None):
     thread.finished_signal.connect(on_finished)
     thread.start()
     dlg.exec()
+    thread.wait()
+    return result['success']
 
-def select_classes_dialog(class_names, parent=None):
+def select_classes_dialog(class_names, parent=None, checked_classes=None, settings=None, fixed_imgsz=None):
+    # Returns (checked class names, inference settings) or None if cancelled
+    settings = dict(settings or DEFAULT_SETTINGS)
     dlg = QDialog(parent)
     dlg.setWindowTitle("Select Classes to Count")
     layout = QVBoxLayout(dlg)
@@ -186,7 +299,7 @@ def select_classes_dialog(class_names, parent=None):
     for cname in class_names:
         item = QListWidgetItem(cname)
         item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Unchecked)  # Start unchecked
+        item.setCheckState(Qt.Checked if checked_classes and cname in checked_classes else Qt.Unchecked)
         list_widget.addItem(item)
     layout.addWidget(list_widget)
     # Add Check All / Uncheck All buttons
@@ -204,6 +317,30 @@ def select_classes_dialog(class_names, parent=None):
             list_widget.item(i).setCheckState(Qt.Unchecked)
     btn_check_all.clicked.connect(check_all)
     btn_uncheck_all.clicked.connect(uncheck_all)
+    # Inference settings, applied inside the model call
+    form = QFormLayout()
+    conf_box = QDoubleSpinBox()
+    conf_box.setRange(0.01, 1.0)
+    conf_box.setSingleStep(0.05)
+    conf_box.setValue(settings['conf'])
+    iou_box = QDoubleSpinBox()
+    iou_box.setRange(0.05, 1.0)
+    iou_box.setSingleStep(0.05)
+    iou_box.setValue(settings['iou'])
+    max_det_box = QSpinBox()
+    max_det_box.setRange(1, 3000)
+    max_det_box.setValue(settings['max_det'])
+    imgsz_box = QSpinBox()
+    imgsz_box.setRange(160, 1920)
+    imgsz_box.setSingleStep(32)
+    imgsz_box.setValue(settings['imgsz'])
+    # Exported backends are built for one input size
+    imgsz_box.setEnabled(fixed_imgsz is None)
+    form.addRow("Confidence threshold:", conf_box)
+    form.addRow("IoU threshold (NMS):", iou_box)
+    form.addRow("Max detections per frame:", max_det_box)
+    form.addRow("Input size:", imgsz_box)
+    layout.addLayout(form)
     buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
     layout.addWidget(buttons)
     def accept():
@@ -219,24 +356,36 @@ def select_classes_dialog(class_names, parent=None):
             item = list_widget.item(i)
             if item.checkState() == Qt.Checked:
                 checked.add(item.text())
-        return checked
+        # Input size must be a multiple of the model stride
+        imgsz = max(32, imgsz_box.value() // 32 * 32)
+        return checked, {'conf': conf_box.value(), 'iou': iou_box.value(),
+                         'max_det': max_det_box.value(), 'imgsz': imgsz}
     else:
         return None
 
 def select_yolo_model(parent=None):
     yolo_dir = os.path.join(os.path.dirname(__file__), "yolo")
     available = [fname for fname, _ in YOLO_MODELS if os.path.exists(os.path.join(yolo_dir, fname))]
-    items = []
+    # The first entry tunes the choice for this machine (see AUTO_TUNE_TARGET_FPS)
+    items = [f"auto - Most accurate model reaching {AUTO_TUNE_TARGET_FPS} FPS on this machine"]
     for fname, desc in YOLO_MODELS:
         status = "(downloaded)" if fname in available else "(will download)" if fname in YOLO_DOWNLOAD_URLS else "(not available)"
         items.append(f"{fname} {status} - {desc}")
-    item, ok = QInputDialog.getItem(parent, "Select YOLO Model", "Choose a YOLOv8 model:", items, 0, False)
+    backends = ", ".join(BACKENDS[name]['label'] for name in available_backends())
+    item, ok = QInputDialog.getItem(parent, "Select YOLO Model", f"Choose a YOLOv8 model:\n(available backends: {backends})", items, 0, False)
     if ok and item:
         fname = item.split()[0]
+        if fname == 'auto':
+            if not any(name in MODEL_MAP for name in available):
+                QMessageBox.critical(parent, "No Models", "Download at least one model before using auto-tune.")
+                return select_yolo_model(parent)
+            return 'auto'
         model_path = os.path.join(yolo_dir, fname)
         if not os.path.exists(model_path):
             if fname in YOLO_DOWNLOAD_URLS:
-                download_yolo_weight(fname, parent)
+                if not download_yolo_weight(fname, parent):
+                    QMessageBox.critical(parent, "Download Failed", f"Could not download {fname}.")
+                    return select_yolo_model(parent)
             else:
                 QMessageBox.critical(parent, "Model Not Available", f"Model {fname} is not available.")
                 return select_yolo_model(parent)
@@ -244,61 +393,433 @@ def select_yolo_model(parent=None):
     else:
         sys.exit(0)
 
+class ExportThread(QThread):
+    finished_signal = Signal(bool, str)
+    def __init__(self, model_path, backend, imgsz):
+        super().__init__()
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+    def run(self):
+        try:
+            self.finished_signal.emit(True, export_model(self.model_path, self.backend, self.imgsz))
+        except Exception as e:
+            self.finished_signal.emit(False, str(e))
+
+def export_model_dialog(model_path, backend, imgsz, parent=None):
+    dlg = QDialog(parent)
+    dlg.setWindowTitle(f"Exporting to {BACKENDS[backend]['label']}")
+    layout = QVBoxLayout(dlg)
+    label = QLabel(f"Exporting {os.path.basename(model_path)} for {BACKENDS[backend]['label']}... This is only done once.")
+    layout.addWidget(label)
+    dlg.setLayout(layout)
+    result = {'success': False}
+    thread = ExportThread(model_path, backend, imgsz)
+    def on_finished(success, msg):
+        result['success'] = success
+        if not success:
+            QMessageBox.critical(dlg, "Export Failed", f"Could not export the model: {msg}")
+        dlg.accept()
+    thread.finished_signal.connect(on_finished)
+    thread.start()
+    dlg.exec()
+    thread.wait()
+    return result['success']
+
+class AutoTuneThread(QThread):
+    log_signal = Signal(str)
+    finished_signal = Signal(object, str)
+    def __init__(self, store, retune=False):
+        super().__init__()
+        self.store = store
+        self.retune = retune
+    def run(self):
+        yolo_dir = os.path.join(os.path.dirname(__file__), "yolo")
+        models = [os.path.join(yolo_dir, name) for name in MODEL_MAP if os.path.exists(os.path.join(yolo_dir, name))]
+        def sample_frames():
+            if AUTO_TUNE_CLIP:
+                return list(video_clip(AUTO_TUNE_CLIP, AUTO_TUNE_FRAMES))
+            return list(synthetic_clip(AUTO_TUNE_FRAMES, 1280, 720))
+        try:
+            profile = tuned_profile(self.store, models, AUTO_TUNE_TARGET_FPS, AUTO_TUNE_STREAMS, sample_frames,
+                                    self.retune, sizes=AUTO_TUNE_SIZES,
+                                    backends=[b for b in AUTO_TUNE_BACKENDS if runtime_installed(b)],
+                                    progress=self.log_signal.emit)
+            self.finished_signal.emit(profile, "")
+        except Exception as e:
+            self.finished_signal.emit(None, str(e))
+
+def auto_tune_dialog(parent=None):
+    # Returns the tuning result for this machine, profiling first unless a stored one is still valid
+    store = TuneStore(AUTO_TUNE_PATH)
+    profile = store.load(AUTO_TUNE_TARGET_FPS, AUTO_TUNE_STREAMS)
+    if profile is not None:
+        return profile
+    dlg = QDialog(parent)
+    dlg.setWindowTitle("Auto-tuning")
+    layout = QVBoxLayout(dlg)
+    label = QLabel(f"Measuring the downloaded models on this machine for {AUTO_TUNE_STREAMS} x "
+                   f"{AUTO_TUNE_TARGET_FPS} FPS... This is only done once.")
+    log = QTextEdit()
+    log.setReadOnly(True)
+    layout.addWidget(label)
+    layout.addWidget(log)
+    dlg.setLayout(layout)
+    result = {'profile': None}
+    thread = AutoTuneThread(store)
+    thread.log_signal.connect(log.append)
+    def on_finished(profile, msg):
+        result['profile'] = profile
+        if profile is None:
+            QMessageBox.critical(dlg, "Auto-tune Failed", f"Could not tune: {msg}")
+        elif not profile['met']:
+            QMessageBox.warning(dlg, "Target Not Reached",
+                                f"No model reaches {AUTO_TUNE_TARGET_FPS} FPS here; using the fastest "
+                                f"({os.path.basename(profile['model_path'])}, {profile['fps']:.1f} FPS).")
+        dlg.accept()
+    thread.finished_signal.connect(on_finished)
+    thread.start()
+    dlg.exec()
+    thread.wait()
+    return result['profile']
+
+def select_backend(model_path, imgsz, parent=None):
+    # Only ask when a faster runtime than PyTorch is installed
+    if available_backends() == ['pytorch']:
+        return 'pytorch'
+    items = []
+    for name, options in BACKENDS.items():
+        if not runtime_installed(name):
+            status = "(not installed)"
+        elif name == 'pytorch' or is_exported(model_path, name, imgsz):
+            status = "(ready)"
+        else:
+            status = "(will export)"
+        items.append(f"{name} {status} - {options['label']}")
+    item, ok = QInputDialog.getItem(parent, "Select Inference Backend", "Choose how to run the model:", items, 0, False)
+    if not ok or not item:
+        return 'pytorch'
+    backend = item.split()[0]
+    if not runtime_installed(backend):
+        QMessageBox.critical(parent, "Backend Not Available", f"{BACKENDS[backend]['label']} is not installed.")
+        return select_backend(model_path, imgsz, parent)
+    if not is_exported(model_path, backend, imgsz) and not export_model_dialog(model_path, backend, imgsz, parent):
+        return select_backend(model_path, imgsz, parent)
+    return backend
+
+class ModelLoadThread(QThread):
+    # Loads (or takes from the model cache) and warms up a detector off the GUI thread
+    loaded_signal = Signal(object, str)
+    def __init__(self, model_cache, model_path, backend, settings):
+        super().__init__()
+        self.model_cache = model_cache
+        self.model_path = model_path
+        self.backend = backend
+        self.settings = settings
+    def run(self):
+        try:
+            detector = self.model_cache.get(self.model_path, self.backend, **self.settings)
+            self.loaded_signal.emit(detector, "")
+        except Exception as e:
+            self.loaded_signal.emit(None, str(e))
+
 class VideoThread(QThread):
     frame_signal = Signal(np.ndarray)
     count_signal = Signal(dict)
     finished_signal = Signal()
+    dropped_signal = Signal(int)
+    totals_signal = Signal(dict)
+    display_signal = Signal()
+    drift_signal = Signal(float)
 
-    def __init__(self, video_path, yolo_detector):
+    def __init__(self, video_path, yolo_detector, batch_size=1, queue_size=4, drop_policy='block',
+                 live=False, display_view=None, display_slot=None, roi=None,
+                 count_store=None, live_server=None, drift_monitor=None):
         super().__init__()
         self.video_path = video_path
         self.yolo_detector = yolo_detector
+        # Motion gating and the region of interest wrap the shared detector per video
+        gate = MotionGate(MOTION_METHOD, max_skip=MOTION_MAX_SKIP) if MOTION_GATING else None
+        # With an auto-tuned model every model call is timed against the tuning measurement
+        self.drift_monitor = drift_monitor
+        self._drift_reported = False
+        base = MonitoredDetector(yolo_detector, drift_monitor) if drift_monitor is not None else yolo_detector
+        base = TiledDetector(base, TILE_SIZE, TILE_OVERLAP) if TILED_INFERENCE else base
+        self.detector = GatedDetector(base, gate, roi)
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.live = live
         self._running = True
         self._paused = False
         self._stopped = False
         self.cap = None
+        self.pipeline = None
+        self.grabber = None
+        self.counter = None
+        # Display path: render the visible region at viewport size on this thread
+        self.display_view = display_view
+        self.display_slot = display_slot
+        # (frame, detections not drawn on it yet), for re-rendering and screenshots
+        self.last_view = None
+        # Set resume_from_checkpoint before start() to continue from the saved checkpoint (see saved_checkpoint)
+        self.resume_from_checkpoint = False
+        self.checkpoint = None
+        # Recording is switched with set_recording; the recorder itself lives on this thread
+        self.recording = False
+        self.recorder = None
+        # Closed recorders still encoding their queued frames; joined when the thread exits
+        self._closing_recorders = []
+        self.fps = 25
+        self._prev_counts, self._prev_totals = {}, None
+        # Counts go to the store under the file name or camera link, timestamped from time_origin
+        # plus the frame position for files and with the wall clock for live streams
+        self.count_store = count_store
+        self.source_name = str(video_path) if live else os.path.basename(str(video_path))
+        self.time_origin = time.time()
+        # Publishes under the same source name as the count store
+        self.live_server = live_server
+        if count_store is not None:
+            count_store.reset_totals(self.source_name)
+        if TRACKING_ENABLED:
+            self.counter = TrackingCounter(
+                lines=[LineCounter(name, p1, p2) for name, p1, p2 in COUNTING_LINES],
+                zones=[ZoneCounter(name, polygon) for name, polygon in COUNTING_ZONES])
+
+    def saved_checkpoint(self):
+        # State of an unfinished earlier run of this file with the same setup, or None
+        if self.live or not CHECKPOINT_DIR:
+            return None
+        if self.checkpoint is None:
+            try:
+                self.checkpoint = checkpoint_for(CHECKPOINT_DIR, self.video_path, self.detector, self.counter,
+                                                 {'max_size': DECODE_MAX_SIZE})
+            except OSError as e:
+                log.warning("Checkpoints disabled: %s", e)
+                return None
+        return self.checkpoint.load()
+
+    def set_recording(self, enabled):
+        self.recording = enabled
+
+    def record(self, frame_idx, frame, counts, totals):
+        if self.recording and self.recorder is None:
+            source = os.path.splitext(os.path.basename(str(self.video_path)))[0] or 'stream'
+            name = f"{source}_{time.strftime('%Y%m%d_%H%M%S')}"
+            if RECORD_MODE == 'events':
+                self.recorder = EventClipRecorder(RECORDINGS_DIR, self.fps, EVENT_CLIP_PRE_SECONDS,
+                                                  EVENT_CLIP_POST_SECONDS, prefix=name, drop_policy='drop_oldest')
+            else:
+                self.recorder = VideoRecorder(os.path.join(RECORDINGS_DIR, name + ".mp4"), self.fps,
+                                              queue_size=RECORD_QUEUE_SIZE)
+            log.info("Recording to %s", RECORDINGS_DIR)
+        elif not self.recording and self.recorder is not None:
+            self.stop_recording()
+        if self.recorder is None:
+            return
+        # Counts are drawn on a copy so the on-screen frame stays unchanged
+        image = draw_counts(frame.copy(), counts, totals)
+        if isinstance(self.recorder, EventClipRecorder):
+            self.recorder.add(frame_idx, image, is_count_event(counts, totals, self._prev_counts, self._prev_totals))
+        else:
+            self.recorder.write(image)
+        self._prev_counts, self._prev_totals = counts, totals
+
+    def stop_recording(self):
+        # Does not wait for the encoder, so detection goes on while queued frames are written
+        if self.recorder is not None:
+            self.recorder.close(wait=False)
+            self._closing_recorders.append(self.recorder)
+            self.recorder = None
+        self.reap_recorders()
+
+    def reap_recorders(self, wait=False):
+        for recorder in list(self._closing_recorders):
+            if wait:
+                recorder.join()
+            if recorder.is_alive():
+                continue
+            self._closing_recorders.remove(recorder)
+            if isinstance(recorder, VideoRecorder):
+                log.info("Recorded %d frames to %s (dropped %d)", recorder.frames, recorder.path, recorder.dropped)
+            else:
+                log.info("Recorded %d event clips (dropped %d)", len(recorder.clips), recorder.dropped)
+
+    def emit_frame(self, frame_idx, frame, detections):
+        t = metrics.start()
+        # Filter detections by selected_classes
+        filtered = filter_detections(detections, selected_classes)
+        counts = count_detections(filtered)
+        totals = None
+        if self.counter is not None:
+            totals = self.counter.update(filtered)
+            self.totals_signal.emit(totals)
+        metrics.stop('count', t)
+        if self.drift_monitor is not None and self.drift_monitor.drifted and not self._drift_reported:
+            self._drift_reported = True
+            self.drift_signal.emit(self.drift_monitor.measured_ms)
+        t = metrics.start()
+        if self.counter is not None:
+            draw_regions(frame, self.counter)
+        if self.detector.roi is not None:
+            draw_roi(frame, self.detector.roi)
+        # Boxes only go onto the full-resolution frame when it is recorded or served; when it is
+        # just viewed they are drawn by render_view after downscaling, at display resolution
+        annotate = self.recording or self.recorder is not None or self.live_server is not None
+        overlay = None if annotate else filtered
+        if annotate:
+            draw_detections(frame, filtered)
+        metrics.stop('draw', t)
+        if self.count_store is not None:
+            timestamp = time.time() if self.live else self.time_origin + frame_idx / self.fps
+            self.count_store.add(self.source_name, timestamp, counts, totals)
+        if self.live_server is not None:
+            self.live_server.publish(self.source_name, frame_idx, counts, totals, frame)
+        if self.recording or self.recorder is not None:
+            self.record(frame_idx, frame, counts, totals)
+        t = metrics.start()
+        self.last_view = (frame, overlay)
+        if self.display_view is not None and self.display_slot is not None:
+            image, _, _ = render_view(frame, *self.display_view.snapshot(), detections=overlay)
+            # Only signal when the GUI has taken the previous frame; otherwise it is replaced
+            if self.display_slot.put(image):
+                self.display_signal.emit()
+        self.frame_signal.emit(frame)
+        self.count_signal.emit(counts)
+        metrics.stop('emit', t)
+        metrics.count('frames_emitted')
+        metrics.gauge('objects', len(filtered))
 
     def run(self):
-        print(f"[DEBUG] Starting video thread for: {self.video_path}")
-        self.cap = cv2.VideoCapture(self.video_path)
+        log.info("Starting video thread for %s", self.video_path)
+        if not self.live:
+            # Identify the run before counting regions are scaled to the decoded frame size
+            self.saved_checkpoint()
+        try:
+            self.cap = open_capture(self.video_path, CAPTURE_BACKEND, DECODER_THREADS, CAPTURE_BUFFER_SIZE,
+                                    DECODE_MAX_SIZE, HW_DECODE)
+        except RuntimeError as e:
+            log.error("Could not open %s: %s", self.video_path, e)
+            self.finished_signal.emit()
+            return
+        if self.counter is not None and self.cap.scale != 1.0:
+            self.counter.scale(self.cap.scale)
+        if self.live:
+            self.run_live()
+        else:
+            self.run_file()
+        self.cap.release()
+        self.stop_recording()
+        self.reap_recorders(wait=True)
+        if self.detector.gate is not None:
+            log.info("Motion gating: %s", self.detector.gate.stats())
+        log.info("Video thread finished")
+        self.finished_signal.emit()
+
+    def run_file(self):
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        frame_interval = 1 / max(self.cap.get(cv2.CAP_PROP_FPS), 1)
+        cache_entry = None
+        if DETECTION_CACHE_DIR:
+            try:
+                cache_entry = DetectionCache(DETECTION_CACHE_DIR, DETECTION_CACHE_MAX_BYTES).entry(
+                    self.video_path, self.detector, {'max_size': DECODE_MAX_SIZE})
+                log.debug("Detection cache: %d frames cached", cache_entry.frames)
+            except OSError as e:
+                log.warning("Detection cache disabled: %s", e)
+        start_frame = 0
+        # Looked up even when not resuming, so this run saves its own checkpoints
+        state = self.saved_checkpoint()
+        if not self.resume_from_checkpoint:
+            state = None
+        if state is not None:
+            start_frame = state['next_frame']
+            if self.counter is not None:
+                self.counter.load_state_dict(state['counter'])
+                if self.count_store is not None:
+                    self.count_store.reset_totals(self.source_name, self.counter.totals())
+            seek_capture(self.cap, start_frame)
+            log.info("Resuming at frame %d", start_frame)
+        store = self.count_store
+        if store is not None and self.checkpoint is not None:
+            # Counts only reach the store up to the saved checkpoint, so a resumed run adds none twice
+            self.count_store = CheckpointedCounts(store)
+        # Capture and inference run on their own threads; this thread annotates and emits
+        self.pipeline = FramePipeline(self.cap.read, self.detector, queue_size=self.queue_size,
+                                      drop_policy=self.drop_policy, batch_size=self.batch_size, cache=cache_entry,
+                                      start_frame=start_frame, max_wait=VIDEO_FILE_BATCH_MAX_WAIT)
+        self.pipeline.start()
+        next_emit = time.monotonic()
+        frame_idx = start_frame
+        next_frame = start_frame
+        for frame_idx, frame, detections in self.pipeline.results():
+            while self._paused and self._running:
+                time.sleep(0.1)
+                next_emit = time.monotonic()
+            if not self._running:
+                break
+            self.emit_frame(frame_idx, frame, detections)
+            next_frame = frame_idx + 1
+            if self.checkpoint is not None and next_frame % CHECKPOINT_EVERY == 0:
+                self.checkpoint.save(next_frame, self.counter)
+                if self.count_store is not store:
+                    self.count_store.commit()
+            # Wait for next frame (simulate real-time)
+            next_emit += frame_interval
+            delay = next_emit - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_emit = time.monotonic()
+        if self._stopped:
+            log.info("Video thread stopped by user at frame %d", frame_idx)
+        self.pipeline.stop()
+        if self.checkpoint is not None:
+            if self._stopped:
+                self.checkpoint.save(next_frame, self.counter)
+            else:
+                self.checkpoint.remove()
+            if self.count_store is not store:
+                self.count_store.commit()
+                self.count_store = store
+        if cache_entry is not None:
+            cache_entry.close()
+        if self.pipeline.dropped:
+            log.info("Pipeline dropped %d frames", self.pipeline.dropped)
+
+    def run_live(self):
+        # Live streams run inference on the newest frame as fast as it completes, never
+        # sleeping to the source frame rate. The grabber only decodes a frame grabbed after
+        # read() is called, so no frame waits behind inference and nothing needs skipping.
+        if not CAPTURE_BUFFER_SIZE:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.grabber = LatestFrameGrabber(self.cap)
+        self.grabber.start()
         frame_idx = 0
-        while self.cap.isOpened() and self._running:
+        while self._running:
             if self._paused:
                 time.sleep(0.1)
                 continue
-            ret, frame = self.cap.read()
+            ret, frame, _ = self.grabber.read(timeout=LIVE_READ_TIMEOUT)
             if not ret:
-                print(f"[DEBUG] End of video or failed to read frame at index {frame_idx}")
+                log.info("Live stream ended or timed out at frame %d", frame_idx)
                 break
-            print(f"[DEBUG] Read frame {frame_idx}")
-            detections = self.yolo_detector.detect(frame)
-            # Filter detections by selected_classes
-            filtered = [det for det in detections if det['class_name'] in selected_classes]
-            print(f"[DEBUG] Detections for frame {frame_idx}: {len(filtered)} objects (filtered)")
-            # Draw boxes and labels
-            for det in filtered:
-                x1, y1, x2, y2 = map(int, det['box'])
-                label = f"{det['class_name']} {det['conf']:.2f}"
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
-                cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
-            # Count objects
-            counts = {}
-            for det in filtered:
-                cname = det['class_name']
-                counts[cname] = counts.get(cname, 0) + 1
-            print(f"[DEBUG] Emitting frame {frame_idx} to UI")
-            self.frame_signal.emit(frame)
-            self.count_signal.emit(counts)
+            with metrics.timer('inference'):
+                detections = self.detector.detect(frame)
+            metrics.count('frames_inferred')
+            self.emit_frame(frame_idx, frame, detections)
+            self.dropped_signal.emit(self.grabber.dropped)
             frame_idx += 1
-            # Wait for next frame (simulate real-time)
-            time.sleep(1 / max(self.cap.get(cv2.CAP_PROP_FPS), 1))
-            if self._stopped:
-                print(f"[DEBUG] Video thread stopped by user at frame {frame_idx}")
-                break
-        self.cap.release()
-        print(f"[DEBUG] Video thread finished.")
-        self.finished_signal.emit()
+        self.grabber.stop()
+        self.grabber.join()
+        log.info("Live stream dropped %d frames", self.grabber.dropped)
 
+    def set_roi(self, polygon):
+        self.detector.set_roi(polygon)
+        # Cached detections were made for the previous region; stop using and extending them
+        if self.pipeline is not None:
+            self.pipeline.cache = None
     def pause(self):
         self._paused = True
     def resume(self):
@@ -306,6 +827,10 @@ class VideoThread(QThread):
     def stop(self):
         self._running = False
         self._stopped = True
+        if self.pipeline is not None:
+            self.pipeline.stop(wait=False)
+        if self.grabber is not None:
+            self.grabber.stop()
 
 class VideoLabel(QLabel):
     def __init__(self, *args, **kwargs):
@@ -316,12 +841,16 @@ class VideoLabel(QLabel):
         self._dragging = False
         self._last_pos = None
         self._resize_callback = None
+        self._click_callback = None
     def set_zoom_callback(self, callback):
         self._zoom_callback = callback
     def set_pan_callback(self, callback):
         self._pan_callback = callback
     def set_resize_callback(self, callback):
         self._resize_callback = callback
+    def set_click_callback(self, callback):
+        # While set, left clicks go to the callback (x, y) instead of starting a pan
+        self._click_callback = callback
     def wheelEvent(self, event):
         if self._zoom_callback:
             delta = event.angleDelta().y()
@@ -330,6 +859,9 @@ class VideoLabel(QLabel):
             elif delta < 0:
                 self._zoom_callback(0.9)
     def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self._click_callback:
+            self._click_callback(event.pos().x(), event.pos().y())
+            return
         if event.button() == Qt.LeftButton and self._zoom_callback and self._pan_callback:
             self._dragging = True
             self._last_pos = event.pos()
@@ -348,6 +880,7 @@ class VideoLabel(QLabel):
         super().resizeEvent(event)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     if not check_python_installed():
         show_python_required_dialog()
@@ -360,20 +893,40 @@ if __name__ == "__main__":
         else:
             sys.exit(0)
 
-    def after_model_selected():
+    def select_classes(initial=False):
         global selected_classes
         class_names = list(yolo_detector.model.names.values()) if hasattr(yolo_detector.model, 'names') else []
-        checked = select_classes_dialog(class_names, window)
-        if checked is not None:
+        result = select_classes_dialog(class_names, window, selected_classes, yolo_detector.settings,
+                                       yolo_detector.fixed_imgsz)
+        if result is not None:
+            checked, settings = result
             selected_classes.clear()
             selected_classes.update(checked)
-        else:
+            yolo_detector.configure(**settings)
+        elif initial:
             selected_classes.clear()
             selected_classes.update(class_names)
+        # Only the selected classes go through the model's NMS; no reload needed
+        yolo_detector.set_classes(selected_classes)
+
+    def after_model_selected():
+        select_classes(initial=True)
 
-    # Model selection dialog
-    selected_model_path = select_yolo_model()
-    yolo_detector = YOLODetector(selected_model_path)
+    model_cache = ModelCache(MODEL_CACHE_SIZE, warmup_batch=VIDEO_FILE_BATCH_SIZE)
+    yolo_detector = None
+    count_store = None
+    if COUNT_STORE_PATH:
+        count_store = CountStore(COUNT_STORE_PATH)
+        count_store.start()
+        app.aboutToQuit.connect(count_store.stop)
+    live_server = None
+    if LIVE_SERVER_PORT is not None:
+        live_server = LiveServer(LIVE_SERVER_HOST, LIVE_SERVER_PORT, LIVE_SERVER_JPEG_QUALITY)
+        if live_server.error is not None:
+            log.error("Live server not started: %s", live_server.error)
+        else:
+            log.info("Live server on http://%s:%d/", LIVE_SERVER_HOST, live_server.port)
+            app.aboutToQuit.connect(live_server.stop)
 
     loader = QUiLoader()
     ui_file = QFile(os.path.join(os.path.dirname(__file__), 'ui', 'main_window.ui'))
@@ -381,8 +934,6 @@ if __name__ == "__main__":
     window = loader.load(ui_file, None)
     ui_file.close()
 
-    after_model_selected()  # Only call here, after window is defined
-
     # Replace label_video with VideoLabel instance
     video_label = VideoLabel()
     video_label.setObjectName("label_video")
@@ -400,46 +951,38 @@ if __name__ == "__main__":
             break
     window.label_video = video_label
 
-    # Store the last displayed frame (QImage)
-    window._last_qimage = None
-    pan_offset = {'x': 0, 'y': 0}
+    # The video thread renders only the visible region at viewport size into display_slot;
+    # the GUI just wraps it in a QImage. The full-resolution frame is kept for screenshots
+    # and for re-rendering when zooming or panning while paused.
+    display_view = DisplayView()
+    display_slot = LatestFrameSlot()
+    window._last_view = None
+    window._last_display = None  # Keeps the QImage buffer alive
+    def show_image(image):
+        h, w = image.shape[:2]
+        qimg = QImage(image.data, w, h, image.strides[0], QImage.Format_BGR888)
+        window._last_display = image
+        window.label_video.setPixmap(QPixmap.fromImage(qimg))
+    def show_display_frame():
+        image = display_slot.take()
+        if image is not None:
+            show_image(image)
+    def current_view():
+        # (frame, detections still to draw) of the last shown frame, or (None, None)
+        if video_thread['thread'] is not None and video_thread['thread'].last_view is not None:
+            return video_thread['thread'].last_view
+        return window._last_view or (None, None)
+    def current_frame():
+        return current_view()[0]
     def render_last_frame():
-        if window._last_qimage:
-            orig_w = window._last_qimage.width()
-            orig_h = window._last_qimage.height()
-            scale = zoom_factor['value']
-            scaled_w = int(orig_w * scale)
-            scaled_h = int(orig_h * scale)
-            view_w = window.label_video.width()
-            view_h = window.label_video.height()
-            max_x = max(0, scaled_w - view_w)
-            max_y = max(0, scaled_h - view_h)
-            # Clamp pan offset
-            if scale <= 1.0:
-                pan_offset['x'] = 0
-                pan_offset['y'] = 0
-            else:
-                pan_offset['x'] = min(max(pan_offset['x'], -max_x), max_x)
-                pan_offset['y'] = min(max(pan_offset['y'], -max_y), max_y)
-            scaled_pixmap = QPixmap.fromImage(window._last_qimage).scaled(
-                scaled_w, scaled_h, aspectMode=Qt.KeepAspectRatio)
-            # Center if not zoomed, else use pan offset
-            if scale <= 1.0:
-                x = max(0, (scaled_w - view_w) // 2)
-                y = max(0, (scaled_h - view_h) // 2)
-            else:
-                x = max(0, pan_offset['x'])
-                y = max(0, pan_offset['y'])
-            cropped = scaled_pixmap.copy(x, y, view_w, view_h)
-            window.label_video.setPixmap(cropped)
-    zoom_factor = {'value': 1.0}
+        display_view.set_viewport(window.label_video.width(), window.label_video.height())
+        frame, overlay = current_view()
+        if frame is not None:
+            image, pan_x, pan_y = render_view(frame, *display_view.snapshot(), detections=overlay)
+            display_view.set_pan(pan_x, pan_y)
+            show_image(image)
     def set_zoom(factor):
-        prev_zoom = zoom_factor['value']
-        zoom_factor['value'] = max(1.0, min(zoom_factor['value'] * factor, 5.0))
-        print(f"[DEBUG] Zoom factor set to {zoom_factor['value']}")
-        if zoom_factor['value'] == 1.0:
-            pan_offset['x'] = 0
-            pan_offset['y'] = 0
+        display_view.zoom_by(factor)
         render_last_frame()
     video_label.set_zoom_callback(set_zoom)
     window.button_zoom_in.clicked.connect(lambda: set_zoom(1.1))
@@ -447,14 +990,29 @@ if __name__ == "__main__":
 
     # Screenshot functionality
     def take_screenshot():
-        if window._last_qimage:
+        frame, overlay = current_view()
+        if frame is not None:
+            if overlay is not None:
+                frame = draw_detections(frame.copy(), overlay)
             file_name, _ = QFileDialog.getSaveFileName(window, "Save Screenshot", "screenshot.jpg", "Images (*.png *.jpg *.bmp)")
             if file_name:
-                window._last_qimage.save(file_name)
+                h, w = frame.shape[:2]
+                QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888).save(file_name)
     window.button_screenshot.clicked.connect(take_screenshot)
 
     # Helper to enable/disable video controls
     video_thread = {'thread': None}
+    # Tuning result the current model was chosen from ("auto" in the model list), else None
+    auto_tune_state = {'profile': None}
+    def new_drift_monitor():
+        profile = auto_tune_state['profile']
+        return DriftMonitor(profile['ms_per_image'], AUTO_TUNE_DRIFT) if profile is not None else None
+    def on_drift(measured_ms):
+        # Slower than when tuned (throttling, other load): tune again the next time "auto" is chosen
+        profile = auto_tune_state['profile']
+        TuneStore(AUTO_TUNE_PATH).mark_stale(profile, measured_ms)
+        window.label_status.setText(f"Model now takes {measured_ms:.1f} ms per image instead of "
+                                    f"{profile['ms_per_image']:.1f} ms; it will be re-tuned next time \"auto\" is chosen.")
     def set_video_controls_enabled(enabled):
         window.button_play.setEnabled(enabled)
         window.button_pause.setEnabled(enabled)
@@ -464,6 +1022,7 @@ if __name__ == "__main__":
         window.button_zoom_in.setEnabled(enabled)
         window.button_zoom_out.setEnabled(enabled)
         window.button_change_engine.setEnabled(True)
+        window.button_classes.setEnabled(True)
         window.button_play.setVisible(enabled)
         window.button_pause.setVisible(enabled)
         window.button_stop.setVisible(enabled)
@@ -471,11 +1030,12 @@ if __name__ == "__main__":
         window.button_zoom_in.setVisible(enabled)
         window.button_zoom_out.setVisible(enabled)
         window.button_change_engine.setVisible(True)
+        window.button_classes.setVisible(True)
 
     def stop_current_video_thread():
         if video_thread['thread'] is not None:
             try:
-                video_thread['thread'].frame_signal.disconnect()
+                video_thread['thread'].display_signal.disconnect()
             except Exception:
                 pass
             try:
@@ -486,8 +1046,21 @@ if __name__ == "__main__":
                 video_thread['thread'].finished_signal.disconnect()
             except Exception:
                 pass
+            try:
+                video_thread['thread'].dropped_signal.disconnect()
+            except Exception:
+                pass
+            try:
+                video_thread['thread'].totals_signal.disconnect()
+            except Exception:
+                pass
+            try:
+                video_thread['thread'].drift_signal.disconnect()
+            except Exception:
+                pass
             video_thread['thread'].stop()
             video_thread['thread'].wait()
+            window._last_view = video_thread['thread'].last_view
             video_thread['thread'] = None
 
     set_video_controls_enabled(False)
@@ -508,25 +1081,36 @@ if __name__ == "__main__":
             window.label_status.setText(f"Selected Video: {file_name}")
             set_video_controls_enabled(True)
             # Start video thread
-            video_thread['thread'] = VideoThread(file_name, yolo_detector)
-            window._last_qimage = None  # Store QImage to keep buffer alive
-            def update_frame(frame):
-                print(f"[DEBUG] update_frame called")
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb.shape
-                bytes_per_line = ch * w
-                qimg = QImage(rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                window._last_qimage = qimg  # Keep reference
-                render_last_frame()
+            video_thread['thread'] = VideoThread(file_name, yolo_detector, batch_size=VIDEO_FILE_BATCH_SIZE,
+                                                 queue_size=VIDEO_FILE_QUEUE_SIZE, drop_policy=VIDEO_FILE_DROP_POLICY,
+                                                 display_view=display_view, display_slot=display_slot,
+                                                 roi=roi_state['polygon'], count_store=count_store,
+                                                 live_server=live_server, drift_monitor=new_drift_monitor())
+            state = video_thread['thread'].saved_checkpoint()
+            if state is not None:
+                reply = QMessageBox.question(window, "Resume",
+                                             f"This video was stopped at frame {state['next_frame']}. Resume from there?",
+                                             QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+                video_thread['thread'].resume_from_checkpoint = reply == QMessageBox.Yes
+            window._last_view = None
+            display_view.set_viewport(window.label_video.width(), window.label_video.height())
+            last_totals = {'text': ""}
             def update_count(counts):
                 if counts:
                     text = ", ".join([f"{k}: {v}" for k, v in counts.items()])
                 else:
                     text = "Object Count: 0"
+                if last_totals['text']:
+                    text += f"  ||  Total {last_totals['text']}"
                 window.label_count.setText(text)
-            video_thread['thread'].frame_signal.connect(update_frame, Qt.QueuedConnection)
+            def update_totals(totals):
+                last_totals['text'] = format_totals(totals)
+            video_thread['thread'].display_signal.connect(show_display_frame, Qt.QueuedConnection)
             video_thread['thread'].count_signal.connect(update_count, Qt.QueuedConnection)
+            video_thread['thread'].totals_signal.connect(update_totals, Qt.QueuedConnection)
+            video_thread['thread'].drift_signal.connect(on_drift, Qt.QueuedConnection)
             video_thread['thread'].finished_signal.connect(lambda: set_video_controls_enabled(False))
+            video_thread['thread'].set_recording(window.button_record.isChecked())
             video_thread['thread'].start()
         else:
             set_video_controls_enabled(False)
@@ -536,28 +1120,35 @@ if __name__ == "__main__":
         if ok and link:
             window.label_status.setText(f"Camera link: {link}")
             set_video_controls_enabled(False)  # Hide controls for live stream
-            video_thread['thread'] = VideoThread(link, yolo_detector)
-            window._last_qimage = None
-            def update_frame(frame):
-                print(f"[DEBUG] update_frame called (camera link)")
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb.shape
-                bytes_per_line = ch * w
-                qimg = QImage(rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                window._last_qimage = qimg
-                render_last_frame()
+            video_thread['thread'] = VideoThread(link, yolo_detector, live=True,
+                                                 display_view=display_view, display_slot=display_slot,
+                                                 roi=roi_state['polygon'], count_store=count_store,
+                                                 live_server=live_server, drift_monitor=new_drift_monitor())
+            window._last_view = None
+            display_view.set_viewport(window.label_video.width(), window.label_video.height())
+            last_totals = {'text': ""}
             def update_count(counts):
                 if counts:
                     text = ", ".join([f"{k}: {v}" for k, v in counts.items()])
                 else:
                     text = "Object Count: 0"
+                if last_totals['text']:
+                    text += f"  ||  Total {last_totals['text']}"
                 window.label_count.setText(text)
+            def update_totals(totals):
+                last_totals['text'] = format_totals(totals)
+            def update_dropped(dropped):
+                window.label_status.setText(f"Camera link: {link} (dropped {dropped} frames)")
             def on_finished():
                 QMessageBox.warning(window, "Stream Ended", "The camera stream ended or could not be opened.")
                 set_video_controls_enabled(False)
-            video_thread['thread'].frame_signal.connect(update_frame, Qt.QueuedConnection)
+            video_thread['thread'].display_signal.connect(show_display_frame, Qt.QueuedConnection)
             video_thread['thread'].count_signal.connect(update_count, Qt.QueuedConnection)
+            video_thread['thread'].totals_signal.connect(update_totals, Qt.QueuedConnection)
+            video_thread['thread'].drift_signal.connect(on_drift, Qt.QueuedConnection)
+            video_thread['thread'].dropped_signal.connect(update_dropped, Qt.QueuedConnection)
             video_thread['thread'].finished_signal.connect(on_finished)
+            video_thread['thread'].set_recording(window.button_record.isChecked())
             video_thread['thread'].start()
         else:
             set_video_controls_enabled(False)
@@ -569,20 +1160,17 @@ if __name__ == "__main__":
         window.label_video.setText("[Video will appear here]")
         window.label_count.setText("Object Count: 0")
         window.label_status.setText("Select a video source to start counting objects:")
-        zoom_factor['value'] = 1.0
-        pan_offset['x'] = 0
-        pan_offset['y'] = 0
-        window._last_qimage = None
+        display_view.reset()
+        window._last_view = None
         set_video_controls_enabled(False)
         # Prompt for new model and classes
-        global selected_model_path, yolo_detector
-        selected_model_path = select_yolo_model(window)
-        yolo_detector = YOLODetector(selected_model_path)
-        after_model_selected()
+        settings = {k: v for k, v in yolo_detector.settings.items() if k != 'classes'}
+        choose_model(settings)
 
     window.button_mp4.clicked.connect(open_mp4)
     window.button_camera_link.clicked.connect(enter_camera_link)
     window.button_change_engine.clicked.connect(change_engine)
+    window.button_classes.clicked.connect(lambda: select_classes())
 
     # Playback controls
     def play_video():
@@ -599,26 +1187,111 @@ if __name__ == "__main__":
     window.button_pause.clicked.connect(pause_video)
     window.button_stop.clicked.connect(stop_video)
 
+    # Region of interest: while "Draw ROI" is checked, clicks on the video add polygon points
+    # (in source frame coordinates); unchecking applies it, fewer than 3 points clears it.
+    roi_state = {'polygon': None, 'points': []}
+    def add_roi_point(x, y):
+        frame = current_frame()
+        if frame is None or window._last_display is None:
+            return
+        offset_x = (window.label_video.width() - window._last_display.shape[1]) / 2
+        offset_y = (window.label_video.height() - window._last_display.shape[0]) / 2
+        point = display_to_frame(x - offset_x, y - offset_y, frame.shape, *display_view.snapshot())
+        roi_state['points'].append(point)
+        window.label_status.setText(f"ROI: {len(roi_state['points'])} points. Uncheck 'Draw ROI' to apply.")
+    def toggle_roi(checked):
+        if checked:
+            roi_state['points'] = []
+            video_label.set_click_callback(add_roi_point)
+            window.label_status.setText("Click on the video to add ROI points. Uncheck 'Draw ROI' to apply.")
+            return
+        video_label.set_click_callback(None)
+        points = roi_state['points']
+        roi_state['polygon'] = points if len(points) >= 3 else None
+        if video_thread['thread'] is not None:
+            video_thread['thread'].set_roi(roi_state['polygon'])
+        window.label_status.setText("ROI applied." if roi_state['polygon'] else "ROI cleared.")
+    window.button_roi.toggled.connect(toggle_roi)
+
     # Pan functionality
-    pan_offset = {'x': 0, 'y': 0}
     def set_pan(dx, dy):
         # Only allow panning if zoomed in
-        if zoom_factor['value'] > 1.0 and window._last_qimage:
-            orig_w = window._last_qimage.width()
-            orig_h = window._last_qimage.height()
-            scale = zoom_factor['value']
-            scaled_w = int(orig_w * scale)
-            scaled_h = int(orig_h * scale)
-            view_w = window.label_video.width()
-            view_h = window.label_video.height()
-            max_x = max(0, scaled_w - view_w)
-            max_y = max(0, scaled_h - view_h)
-            pan_offset['x'] = min(max(pan_offset['x'] - dx, -max_x), max_x)
-            pan_offset['y'] = min(max(pan_offset['y'] - dy, -max_y), max_y)
+        if display_view.zoom > 1.0 and current_frame() is not None:
+            display_view.pan_by(dx, dy)
             render_last_frame()
     video_label.set_pan_callback(set_pan)
 
     video_label.set_resize_callback(render_last_frame)
 
+    # Metrics export and on-screen stats
+    metrics_exporter = None
+    if METRICS_JSONL_PATH or METRICS_HTTP_PORT:
+        metrics_exporter = MetricsExporter(jsonl_path=METRICS_JSONL_PATH, port=METRICS_HTTP_PORT,
+                                           interval=METRICS_EXPORT_INTERVAL)
+        metrics_exporter.start()
+    window.label_stats.setVisible(False)
+    stats_timer = QTimer(window)
+    stats_timer.setInterval(500)
+    stats_timer.timeout.connect(lambda: window.label_stats.setText(metrics.summary()))
+    def toggle_stats(checked):
+        window.label_stats.setVisible(bool(checked))
+        if checked:
+            metrics.enable()
+            stats_timer.start()
+        else:
+            stats_timer.stop()
+            if metrics_exporter is None:
+                metrics.disable()
+    window.checkbox_stats.toggled.connect(toggle_stats)
+
+    # Recording of the annotated stream (see RECORD_MODE)
+    def toggle_record(checked):
+        if video_thread['thread'] is not None:
+            video_thread['thread'].set_recording(checked)
+        window.label_status.setText(f"Recording to {RECORDINGS_DIR}" if checked else "Recording stopped.")
+    window.button_record.toggled.connect(toggle_record)
+
+    # The window shows right away; the model is loaded and warmed up on a background thread and
+    # the source buttons are enabled once it is ready
+    model_buttons = [window.button_mp4, window.button_camera_link, window.button_change_engine, window.button_classes]
+    model_loader = {'thread': None}
+    def load_model(model_path, backend, settings):
+        for button in model_buttons:
+            button.setEnabled(False)
+        window.label_status.setText(f"Loading {os.path.basename(model_path)} ({BACKENDS[backend]['label']})...")
+        thread = ModelLoadThread(model_cache, model_path, backend, settings)
+        def loaded(detector, error):
+            global yolo_detector
+            model_loader['thread'] = None
+            for button in model_buttons:
+                button.setEnabled(True)
+            if detector is None:
+                QMessageBox.critical(window, "Model Load Failed", f"Could not load {model_path}:\n{error}")
+                if yolo_detector is None:
+                    choose_model(settings)
+                return
+            yolo_detector = detector
+            window.label_status.setText("Select a video source to start counting objects:")
+            after_model_selected()
+        thread.loaded_signal.connect(loaded, Qt.QueuedConnection)
+        model_loader['thread'] = thread
+        thread.start()
+    def choose_model(settings=None):
+        global selected_model_path, selected_backend
+        settings = settings or {}
+        selected_model_path = select_yolo_model(window)
+        auto_tune_state['profile'] = None
+        if selected_model_path == 'auto':
+            profile = auto_tune_dialog(window)
+            if profile is None:
+                return choose_model(settings)
+            auto_tune_state['profile'] = profile
+            selected_model_path, selected_backend = profile['model_path'], profile['backend']
+            settings = dict(settings, imgsz=profile['imgsz'])
+        else:
+            selected_backend = select_backend(selected_model_path, settings.get('imgsz', DEFAULT_SETTINGS['imgsz']), window)
+        load_model(selected_model_path, selected_backend, settings)
+
     window.show()
+    QTimer.singleShot(0, choose_model)
     sys.exit(app.exec()) 
\ No newline at end of file
@@ -0,0 +1,207 @@
+import collections
+import hashlib
+import json
+import os
+import platform
+import time
+from yolo.benchmark import run_benchmark, synthetic_clip
+
+# COCO val mAP50-95 of the YOLOv8 detection models at 640 px, as published by Ultralytics.
+# Used only to rank accuracy: a bigger model first, then a bigger input size.
+MODEL_MAP = {'yolov8n.pt': 37.3, 'yolov8s.pt': 44.9, 'yolov8m.pt': 50.2, 'yolov8l.pt': 52.9, 'yolov8x.pt': 53.9}
+
+def machine_info():
+    info = {'node': platform.node(), 'machine': platform.machine(), 'processor': platform.processor(),
+            'system': platform.system(), 'cpus': os.cpu_count()}
+    try:
+        import torch
+        if torch.cuda.is_available():
+            info['gpu'] = torch.cuda.get_device_name(0)
+    except ImportError:
+        pass
+    return info
+
+def machine_key(info=None):
+    info = machine_info() if info is None else info
+    return hashlib.blake2b(json.dumps(info, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def accuracy_rank(result):
+    # Higher is more accurate; INT8 quantization only breaks ties
+    return (MODEL_MAP.get(os.path.basename(result['model_path']), 0.0), result['imgsz'],
+            result['backend'] != 'openvino-int8')
+
+def _default_load(model_path, backend, imgsz):
+    from yolo.detector import YOLODetector
+    detector = YOLODetector(model_path, backend=backend, imgsz=imgsz)
+    detector.warmup()
+    return detector
+
+class AutoTuner:
+    # Profiles model weights x input sizes x backends on sample frames with the same per-frame
+    # loop as "bench" (inference, counting, drawing) and picks the most accurate configuration
+    # whose throughput covers target_fps for every stream. Larger models and input sizes are
+    # never faster, so for each input size (small to large) models are tried from the largest
+    # one that was fast enough at the previous size downwards, stopping at the first that is
+    # fast enough; most configurations are never loaded.
+    # load(model_path, backend, imgsz) returns a warmed-up detector.
+    def __init__(self, model_paths, backends=('pytorch',), sizes=(640, 480, 320), frames=(), warmup=5,
+                 batch_size=1, load=None, progress=None):
+        self.model_paths = sorted(model_paths, key=lambda p: MODEL_MAP.get(os.path.basename(p), 0.0))
+        self.backends = list(backends)
+        self.sizes = sorted(sizes)
+        self.frames = list(frames) or list(synthetic_clip(60, 1280, 720))
+        self.warmup = warmup
+        self.batch_size = batch_size
+        self.load = load or _default_load
+        self.progress = progress
+
+    def measure(self, model_path, backend, imgsz):
+        detector = self.load(model_path, backend, imgsz)
+        if self.warmup:
+            run_benchmark((f.copy() for f in self.frames[:self.warmup]), detector, batch_size=self.batch_size)
+        result = run_benchmark((f.copy() for f in self.frames), detector, batch_size=self.batch_size)
+        stages = result['stages']
+        # Model stage time per image, measured the same way MonitoredDetector does at runtime
+        return {'model_path': model_path, 'backend': backend, 'imgsz': imgsz, 'fps': result['fps'],
+                'ms_per_image': sum(stages[s]['mean_ms'] for s in ('preprocess', 'inference', 'postprocess'))}
+
+    def run(self, target_fps, streams=1):
+        needed = target_fps * streams
+        results = []
+        for backend in self.backends:
+            limit = len(self.model_paths)
+            for imgsz in self.sizes:
+                passed = False
+                for i in reversed(range(limit)):
+                    model_path = self.model_paths[i]
+                    if self.progress is not None:
+                        self.progress(f"{os.path.basename(model_path)} {backend} {imgsz}px")
+                    try:
+                        result = self.measure(model_path, backend, imgsz)
+                    except Exception as e:
+                        # e.g. an export that fails on this machine: skip the backend for this model
+                        results.append({'model_path': model_path, 'backend': backend, 'imgsz': imgsz,
+                                        'error': str(e)})
+                        continue
+                    results.append(result)
+                    if self.progress is not None:
+                        self.progress(f"  {result['fps']:.1f} FPS")
+                    if result['fps'] >= needed:
+                        limit, passed = i + 1, True
+                        break
+                if not passed:
+                    # Nothing is fast enough at this size, so neither at larger ones
+                    break
+        measured = [r for r in results if 'fps' in r]
+        if not measured:
+            raise RuntimeError("No configuration could be profiled")
+        passing = [r for r in measured if r['fps'] >= needed]
+        if passing:
+            best = max(passing, key=lambda r: (accuracy_rank(r), r['fps']))
+        else:
+            best = max(measured, key=lambda r: r['fps'])
+        return dict(best, met=bool(passing), target_fps=target_fps, streams=streams, machine=machine_info(),
+                    tuned_at=time.time(), results=results)
+
+class TuneStore:
+    # Tuning results per machine and target in a JSON file, so each machine tunes once and
+    # later starts reuse the choice. A profile marked stale (throughput drifted) is tuned again.
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def key(self, target_fps, streams):
+        return f"{machine_key()}/{target_fps:g}fps/{streams}"
+
+    def load(self, target_fps, streams=1):
+        profile = self._read().get(self.key(target_fps, streams))
+        if profile is None or profile.get('stale') or not os.path.exists(profile['model_path']):
+            return None
+        return profile
+
+    def save(self, profile):
+        data = self._read()
+        data[self.key(profile['target_fps'], profile['streams'])] = profile
+        self._write(data)
+
+    def mark_stale(self, profile, measured_ms=None):
+        data = self._read()
+        stored = data.get(self.key(profile['target_fps'], profile['streams']))
+        if stored is not None:
+            stored['stale'] = True
+            stored['drift_ms_per_image'] = measured_ms
+            self._write(data)
+
+class DriftMonitor:
+    # Compares the model time per image seen while running with the time measured when tuning
+    # (both from the model's own stage timings; batching only lowers the per-image time).
+    # `drifted` is set once the mean over the last `window` images is more than `tolerance`
+    # above it (e.g. thermal throttling or other load on the machine).
+    def __init__(self, expected_ms, tolerance=0.3, window=300):
+        self.expected_ms = expected_ms
+        self.tolerance = tolerance
+        self._times = collections.deque(maxlen=window)
+        self._total = 0.0
+        self.drifted = False
+        self.measured_ms = None
+
+    def observe(self, images, seconds):
+        if images <= 0:
+            return
+        per_image = seconds / images * 1000
+        for _ in range(images):
+            if len(self._times) == self._times.maxlen:
+                self._total -= self._times[0]
+            self._times.append(per_image)
+            self._total += per_image
+        if len(self._times) == self._times.maxlen:
+            self.measured_ms = self._total / len(self._times)
+            if self.measured_ms > self.expected_ms * (1 + self.tolerance):
+                self.drifted = True
+
+class MonitoredDetector:
+    # Feeds the monitor the model's own preprocess/inference/postprocess times of every call
+    # (last_timings), the same per-image measure ms_per_image is taken from when tuning, so
+    # predictor setup and call overhead do not count as drift. Behind tiling, each tile is one
+    # image at the tuned input size. Otherwise behaves like the wrapped detector.
+    def __init__(self, detector, monitor):
+        self.detector = detector
+        self.monitor = monitor
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def fingerprint(self):
+        return self.detector.fingerprint()
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, **overrides):
+        results = self.detector.detect_batch(frames, **overrides)
+        self.monitor.observe(len(frames), sum(self.detector.last_timings.get(stage, 0.0)
+                                              for stage in ('preprocess', 'inference', 'postprocess')))
+        return results
+
+def tuned_profile(store, model_paths, target_fps, streams=1, sample_frames=None, retune=False, **tuner_options):
+    # The stored profile for this machine and target, tuning first when there is none (or it
+    # went stale). sample_frames() is only called when tuning.
+    profile = None if retune else store.load(target_fps, streams)
+    if profile is None:
+        frames = sample_frames() if sample_frames is not None else ()
+        profile = AutoTuner(model_paths, frames=frames, **tuner_options).run(target_fps, streams)
+        store.save(profile)
+    return profile
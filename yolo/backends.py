@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import shutil
+
+# Inference backends a YOLO model can run on. Exported models are cached next to the
+# .pt weights, one file (or OpenVINO directory) per backend and input size, and loaded
+# through ultralytics so detect() and the inference settings work the same on all of them.
+BACKENDS = {
+    'pytorch': {'label': "PyTorch", 'module': 'torch', 'batch': True},
+    'onnx': {'label': "ONNX Runtime", 'module': 'onnxruntime', 'format': 'onnx', 'dynamic': True, 'batch': True},
+    'openvino': {'label': "OpenVINO", 'module': 'openvino', 'format': 'openvino', 'batch': False},
+    'openvino-int8': {'label': "OpenVINO INT8", 'module': 'openvino', 'format': 'openvino', 'int8': True, 'batch': False},
+}
+
+def runtime_installed(backend):
+    return importlib.util.find_spec(BACKENDS[backend]['module']) is not None
+
+def available_backends():
+    return [name for name in BACKENDS if runtime_installed(name)]
+
+def exported_path(model_path, backend, imgsz=640):
+    if backend == 'pytorch':
+        return model_path
+    stem, _ = os.path.splitext(model_path)
+    tag = backend.replace('-', '_')
+    if BACKENDS[backend]['format'] == 'openvino':
+        # ultralytics recognises OpenVINO models by the directory suffix
+        return f"{stem}_{imgsz}_{tag}_openvino_model"
+    return f"{stem}_{imgsz}.onnx"
+
+def is_exported(model_path, backend, imgsz=640):
+    return os.path.exists(exported_path(model_path, backend, imgsz))
+
+def export_model(model_path, backend, imgsz=640):
+    # Exports once and returns the cached path on later calls
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    target = exported_path(model_path, backend, imgsz)
+    if os.path.exists(target):
+        return target
+    if not runtime_installed(backend):
+        raise RuntimeError(f"{BACKENDS[backend]['label']} is not installed (pip install {BACKENDS[backend]['module']})")
+    from ultralytics import YOLO
+    options = BACKENDS[backend]
+    # ONNX is exported with a dynamic batch axis so detect_batch still makes one call
+    exported = YOLO(model_path).export(format=options['format'], imgsz=imgsz, int8=options.get('int8', False),
+                                       dynamic=options.get('dynamic', False))
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(exported, target)
+    return target
+
+def supports_batch(backend):
+    return BACKENDS[backend]['batch']
+
+def resolve_model(model_path, backend='pytorch', imgsz=640):
+    if backend == 'pytorch':
+        return model_path
+    return export_model(model_path, backend, imgsz)
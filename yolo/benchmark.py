@@ -0,0 +1,191 @@
+import json
+import platform
+import time
+import cv2
+import numpy as np
+from yolo.results import Detections
+from yolo.counting import filter_detections, count_detections, draw_regions
+from yolo.display import render_view
+from yolo.pipeline import FramePipeline
+from yolo.tracker import TrackingCounter
+
+STAGES = ['decode', 'preprocess', 'inference', 'postprocess', 'count', 'draw', 'emit']
+
+STUB_NAMES = {0: 'person', 1: 'bicycle', 2: 'car', 3: 'motorcycle', 5: 'bus', 7: 'truck', 24: 'backpack'}
+
+class StubDetector:
+    # Stands in for YOLODetector without weights: returns num_boxes boxes drifting across the
+    # frame, optionally sleeping to simulate model time, so pipeline overhead can be measured.
+    def __init__(self, num_boxes=20, inference_time=0.0, seed=0):
+        self.num_boxes = num_boxes
+        self.inference_time = inference_time
+        self.seed = seed
+        self.names = dict(STUB_NAMES)
+        self.settings = {'classes': None}
+        self.last_timings = {}
+        self._frame_idx = 0
+        rng = np.random.default_rng(seed)
+        self._origin = rng.random((num_boxes, 2), dtype=np.float32)
+        self._velocity = (rng.random((num_boxes, 2), dtype=np.float32) - 0.5) * 0.01
+        self._class_id = rng.choice(list(self.names), num_boxes)
+
+    def fingerprint(self):
+        return {'stub': [self.num_boxes, self.seed]}
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, **overrides):
+        start = time.perf_counter()
+        if self.inference_time:
+            time.sleep(self.inference_time * len(frames))
+        inference = time.perf_counter() - start
+        start = time.perf_counter()
+        detections = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            pos = (self._origin + self._velocity * self._frame_idx) % 1.0
+            xy = pos * np.array([w - 40, h - 40], dtype=np.float32)
+            boxes = np.concatenate([xy, xy + 40], axis=1)
+            detections.append(Detections(boxes, np.full(self.num_boxes, 0.9), self._class_id, self.names))
+            self._frame_idx += 1
+        self.last_timings = {'preprocess': 0.0, 'inference': inference, 'postprocess': time.perf_counter() - start}
+        return detections
+
+def synthetic_clip(num_frames=300, width=1280, height=720, seed=0):
+    # Yields frames with noise and a few moving rectangles, so decode-free runs still do real pixel work
+    rng = np.random.default_rng(seed)
+    # Built up front so it is not counted as decode time of the first frame
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    def frames():
+        for i in range(num_frames):
+            frame = background.copy()
+            x = (i * 7) % max(1, width - 100)
+            cv2.rectangle(frame, (x, height // 3), (x + 100, height // 3 + 60), (0, 0, 255), -1)
+            yield frame
+    return frames()
+
+def video_clip(path, max_frames=None):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {path}")
+    try:
+        count = 0
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+            count += 1
+    finally:
+        cap.release()
+
+def percentiles(values):
+    if not values:
+        return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+    ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'mean_ms': float(ms.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+# GUI video label size the emitted frames are rendered for
+DEFAULT_VIEWPORT = (960, 540)
+
+class _StageTimer:
+    # Records the detector's own preprocess/inference/postprocess times of every call, split
+    # evenly over the frames of the batch; only called from the pipeline's inference thread
+    def __init__(self, detector, stages):
+        self.detector = detector
+        self.stages = stages
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def detect_batch(self, frames, **overrides):
+        results = self.detector.detect_batch(frames, **overrides)
+        for stage in ('preprocess', 'inference', 'postprocess'):
+            share = self.detector.last_timings.get(stage, 0.0) / len(frames)
+            self.stages[stage].extend([share] * len(frames))
+        return results
+
+def run_benchmark(frames, detector, selected_classes=None, batch_size=1, track=False, draw=True,
+                  viewport=DEFAULT_VIEWPORT, queue_size=4, max_wait=0.0):
+    # Runs frames through the same FramePipeline as VideoThread (decoding overlaps inference)
+    # as fast as possible, with no real-time sleep, and records per-stage times. Then it does
+    # the VideoThread per-frame work: count, draw the counting regions, and emit. Emitting is
+    # render_view at the viewport size, with boxes drawn at display resolution when draw is set.
+    # Model stages are split evenly over the frames of their batch. Latency is per frame, from
+    # the start of its decode to the end of its emit.
+    frames = iter(frames)
+    selected_classes = set(detector.names.values()) if selected_classes is None else set(selected_classes)
+    counter = TrackingCounter() if track else None
+    stages = {name: [] for name in STAGES}
+    # Decode start per frame index, in the order FramePipeline numbers the frames
+    started = []
+    latencies = []
+    total = 0
+
+    def read_frame():
+        t0 = time.perf_counter()
+        frame = next(frames, None)
+        if frame is None:
+            return False, None
+        stages['decode'].append(time.perf_counter() - t0)
+        started.append(t0)
+        return True, frame
+
+    pipeline = FramePipeline(read_frame, _StageTimer(detector, stages), queue_size=queue_size, batch_size=batch_size,
+                             max_wait=max_wait)
+    start = time.perf_counter()
+    pipeline.start()
+    try:
+        for frame_idx, frame, detections in pipeline.results():
+            t = time.perf_counter()
+            filtered = filter_detections(detections, selected_classes)
+            count_detections(filtered)
+            if counter is not None:
+                counter.update(filtered)
+            t_count = time.perf_counter()
+            if draw and counter is not None:
+                draw_regions(frame, counter)
+            t_draw = time.perf_counter()
+            render_view(frame, *viewport, detections=filtered if draw else None)
+            t_emit = time.perf_counter()
+            stages['count'].append(t_count - t)
+            stages['draw'].append(t_draw - t_count)
+            stages['emit'].append(t_emit - t_draw)
+            latencies.append(t_emit - started[frame_idx])
+            total += 1
+    finally:
+        pipeline.stop()
+    elapsed = time.perf_counter() - start
+    return {
+        'frames': total,
+        'seconds': elapsed,
+        'fps': total / elapsed if elapsed else 0.0,
+        'stages': {name: percentiles(values) for name, values in stages.items()},
+        'latency': percentiles(latencies),
+        'machine': {'platform': platform.platform(), 'processor': platform.processor(), 'python': platform.python_version()},
+    }
+
+def compare(current, previous):
+    # Lines describing how FPS and latency changed against an earlier result file
+    lines = []
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+    lines.append(f"fps: {previous['fps']:.1f} -> {current['fps']:.1f} ({change(current['fps'], previous['fps'])})")
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        old, new = previous['latency'][key], current['latency'][key]
+        lines.append(f"latency {key}: {old:.2f} -> {new:.2f} ({change(new, old)})")
+    for stage in STAGES:
+        old = previous['stages'].get(stage, {}).get('mean_ms', 0.0)
+        new = current['stages'][stage]['mean_ms']
+        lines.append(f"{stage} mean_ms: {old:.2f} -> {new:.2f} ({change(new, old)})")
+    return lines
+
+def save_result(result, path):
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+def load_result(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from yolo.results import Detections
+from yolo.digest import SAMPLE_SIZE, file_digest
+from yolo.metrics import metrics
+
+# Bytes appended to an entry between two eviction passes over the cache directory
+EVICT_STEP = 64 * 1024 * 1024
+
+def cache_key(video_path, detector, capture=None, fingerprint=None):
+    # The detector fingerprint covers weights, backend and inference settings except the class
+    # filter: entries hold all classes so any class selection can be replayed from them.
+    # capture holds the reader options that change the decoded frames (e.g. max_size).
+    fingerprint = detector.fingerprint() if fingerprint is None else fingerprint
+    parts = {'video': file_digest(video_path, SAMPLE_SIZE), 'detector': fingerprint}
+    if capture:
+        parts['capture'] = capture
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+class CacheEntry:
+    # Columnar detections for one (video, detector) pair, appended frame by frame:
+    # counts.i32 holds the number of boxes per frame, boxes.f32/conf.f32/class_id.i16 the
+    # boxes of all frames back to back. Existing data is read through memory maps.
+    # fingerprint is the detector fingerprint the entry was keyed by: batches run with other
+    # settings (changed while the video runs) bypass the entry. Appending stops at max_bytes,
+    # and evict() is called every EVICT_STEP bytes so other entries make room while writing.
+    FILES = {'boxes': (np.float32, 4), 'conf': (np.float32, 1), 'class_id': (np.int16, 1)}
+
+    def __init__(self, path, names=None, fingerprint=None, max_bytes=None, evict=None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.evict = evict
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.names = {int(k): v for k, v in json.load(f)['names'].items()}
+        else:
+            self.names = dict(names or {})
+            with open(meta_path, 'w') as f:
+                json.dump({'names': self.names}, f)
+        os.utime(meta_path)  # last use, for LRU eviction
+        self._repair()
+        self._open_maps()
+        self._files = None
+        self._bytes = self.size()
+        self._unevicted = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name + ('.i32' if name == 'counts' else '.bin'))
+
+    def _repair(self):
+        # Data is written before counts, so after a crash trailing data beyond what counts
+        # describe (or a torn counts record) is cut off and the entry stays consistent
+        counts_path = self._file('counts')
+        if not os.path.exists(counts_path):
+            open(counts_path, 'wb').close()
+        size = os.path.getsize(counts_path)
+        if size % 4:
+            os.truncate(counts_path, size - size % 4)
+        counts = np.fromfile(counts_path, dtype=np.int32)
+        total = int(counts.sum())
+        for name, (dtype, width) in self.FILES.items():
+            path = self._file(name)
+            expected = total * width * np.dtype(dtype).itemsize
+            if not os.path.exists(path) or os.path.getsize(path) < expected:
+                # Lost data: drop everything and start the entry over
+                for p in [counts_path] + [self._file(n) for n in self.FILES]:
+                    open(p, 'wb').close()
+                return
+            if os.path.getsize(path) > expected:
+                os.truncate(path, expected)
+
+    def _open_maps(self):
+        counts = np.fromfile(self._file('counts'), dtype=np.int32)
+        self.frames = len(counts)
+        self._readable = len(counts)
+        self._offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        self._maps = {}
+        for name, (dtype, width) in self.FILES.items():
+            if self._offsets[-1]:
+                data = np.memmap(self._file(name), dtype=dtype, mode='r')
+                self._maps[name] = data.reshape(-1, width) if width > 1 else data
+            else:
+                self._maps[name] = np.zeros((0, width) if width > 1 else 0, dtype=dtype)
+
+    def lookup(self, frame_idx):
+        if frame_idx >= self._readable:
+            return None
+        a, b = self._offsets[frame_idx], self._offsets[frame_idx + 1]
+        return Detections(np.array(self._maps['boxes'][a:b]), np.array(self._maps['conf'][a:b]),
+                          self._maps['class_id'][a:b].astype(np.int64), self.names)
+
+    def append(self, frame_idx, detections):
+        # Only the next frame in sequence is stored; anything else (e.g. after a seek) is skipped
+        if frame_idx != self.frames:
+            return False
+        added = len(detections) * sum(np.dtype(dtype).itemsize * width for dtype, width in self.FILES.values()) + 4
+        if self.max_bytes is not None and self._bytes + added > self.max_bytes:
+            return False
+        if self._files is None:
+            self._files = {name: open(self._file(name), 'ab') for name in list(self.FILES) + ['counts']}
+        for name, (dtype, _) in self.FILES.items():
+            self._files[name].write(np.ascontiguousarray(getattr(detections, name), dtype=dtype).tobytes())
+            self._files[name].flush()
+        self._files['counts'].write(np.int32(len(detections)).tobytes())
+        self._files['counts'].flush()
+        self.frames += 1
+        self._bytes += added
+        self._unevicted += added
+        if self.evict is not None and self._unevicted >= EVICT_STEP:
+            self._unevicted = 0
+            self.evict()
+        return True
+
+    def detect_batch(self, detector, frame_indices, frames):
+        # Cached frames are replayed, the others run the detector with all classes and are
+        # stored; the detector's current class filter is applied to both afterwards
+        if self.fingerprint is not None and detector.fingerprint() != self.fingerprint:
+            metrics.count('cache_bypassed', len(frames))
+            return detector.detect_batch(frames)
+        results = [self.lookup(i) for i in frame_indices]
+        missing = [k for k, d in enumerate(results) if d is None]
+        if missing:
+            computed = detector.detect_batch([frames[k] for k in missing], classes=None)
+            for k, d in zip(missing, computed):
+                self.append(frame_indices[k], d)
+                results[k] = d
+        metrics.count('cache_hits', len(results) - len(missing))
+        metrics.count('cache_misses', len(missing))
+        classes = detector.settings.get('classes')
+        if classes is not None:
+            results = [d.filter_classes(classes) for d in results]
+        return results
+
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
+
+    def close(self):
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+        self._maps = {}
+
+class DetectionCache:
+    # Directory of CacheEntry folders named by cache_key, evicted least recently used first
+    # once their total size goes over max_bytes (when an entry is opened and while it grows)
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry(self, video_path, detector, capture=None):
+        fingerprint = detector.fingerprint()
+        with self._lock:
+            path = os.path.join(self.cache_dir, cache_key(video_path, detector, capture, fingerprint))
+            entry = CacheEntry(path, detector.names, fingerprint, self.max_bytes, lambda: self.evict(keep=path))
+            self._evict(keep=path)
+        return entry
+
+    def entries(self):
+        # (last_used, size, path), oldest first
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            meta = os.path.join(path, 'meta.json')
+            if os.path.isfile(meta):
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                found.append((os.path.getmtime(meta), size, path))
+        return sorted(found)
+
+    def evict(self, keep=None):
+        with self._lock:
+            self._evict(keep)
+
+    def _evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            metrics.count('cache_evictions')
@@ -0,0 +1,145 @@
+import importlib.util
+import cv2
+
+CAPTURE_BACKENDS = {
+    'auto': cv2.CAP_ANY,
+    'ffmpeg': cv2.CAP_FFMPEG,
+    'gstreamer': cv2.CAP_GSTREAMER,
+    'pyav': None,  # yolo.capture.PyAVReader, needs the optional 'av' package
+}
+
+def pyav_installed():
+    return importlib.util.find_spec('av') is not None
+
+def scaled_size(width, height, max_size):
+    # Size after downscaling so the longer side is at most max_size (never upscales)
+    if not max_size or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    # Even sizes keep chroma-subsampled scalers happy
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+class VideoReader:
+    # cv2.VideoCapture with capture options applied when opening, and frames downscaled right
+    # after decoding so nothing downstream (queues, model preprocessing, drawing) handles full
+    # resolution. Everything else (get, set, grab, isOpened, ...) goes to the capture.
+    def __init__(self, source, backend='auto', threads=0, buffer_size=0, max_size=None, hw_accel=False):
+        params = []
+        if threads:
+            params += [cv2.CAP_PROP_N_THREADS, threads]
+        if hw_accel:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self.cap = cv2.VideoCapture(source, CAPTURE_BACKENDS[backend], params)
+        if buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.max_size = max_size
+        self.size = None
+        # Factor from source pixels to delivered frame pixels
+        self.scale = 1.0
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width and height:
+            self._set_size(width, height)
+
+    def _set_size(self, width, height):
+        self.size = scaled_size(width, height, self.max_size)
+        self.scale = self.size[0] / width
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+    def _resize(self, ret, frame):
+        if ret and self.size is None:
+            # Some streams only report their size once the first frame is decoded
+            self._set_size(frame.shape[1], frame.shape[0])
+        if ret and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return ret, frame
+
+    def read(self):
+        return self._resize(*self.cap.read())
+
+    def retrieve(self):
+        return self._resize(*self.cap.retrieve())
+
+class PyAVReader:
+    # VideoCapture-like reader on PyAV. FFmpeg decodes with its own frame/slice threads and
+    # downscaling happens in the same swscale pass that converts to BGR.
+    def __init__(self, source, threads=0, max_size=None):
+        import av
+        self._av = av
+        self.source = source
+        self.threads = threads
+        self.max_size = max_size
+        self._open()
+        stream = self.stream
+        self.size = scaled_size(stream.codec_context.width, stream.codec_context.height, max_size)
+        self.scale = self.size[0] / stream.codec_context.width if stream.codec_context.width else 1.0
+
+    def _open(self):
+        self.container = self._av.open(self.source)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        if self.threads:
+            self.stream.codec_context.thread_count = self.threads
+        self._frames = self.container.decode(self.stream)
+        self._frame = None
+        self.position = 0
+
+    def isOpened(self):
+        return self.container is not None
+
+    def grab(self):
+        try:
+            self._frame = next(self._frames)
+        except (StopIteration, self._av.error.FFmpegError):
+            self._frame = None
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        if self._frame is None:
+            return False, None
+        width, height = self.size
+        return True, self._frame.to_ndarray(format='bgr24', width=width, height=height)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.stream.average_rate or 0)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.stream.frames)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1])
+        return 0.0
+
+    def set(self, prop, value):
+        # Only rewinding is supported; other seeks return False so callers fall back to grab()
+        if prop == cv2.CAP_PROP_POS_FRAMES and value == 0:
+            self.release()
+            self._open()
+            return True
+        return False
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+def open_capture(source, backend='auto', threads=0, buffer_size=0, max_size=None, hw_accel=False):
+    # Opens a file or stream URL with the given capture options; returns a VideoCapture-like reader
+    # with a `scale` attribute (delivered frame pixels per source pixel)
+    if backend == 'pyav':
+        if not pyav_installed():
+            raise RuntimeError("The 'pyav' capture backend needs PyAV: pip install av")
+        return PyAVReader(source, threads=threads, max_size=max_size)
+    return VideoReader(source, backend, threads, buffer_size, max_size, hw_accel)
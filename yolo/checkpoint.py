@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import time
+import cv2
+from yolo.digest import SAMPLE_SIZE, file_digest
+
+class Checkpoint:
+    # Progress of a long offline run saved as JSON: the next frame to process, the tracking
+    # counter state and how far the output log had been written. identity describes the video,
+    # detector and counting setup; a checkpoint saved for a different identity is ignored.
+    def __init__(self, path, identity):
+        self.path = path
+        self.identity = identity
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('identity') != self.identity:
+            return None
+        return state
+
+    def save(self, next_frame, counter=None, output_size=None):
+        state = {
+            'identity': self.identity,
+            'next_frame': next_frame,
+            'counter': counter.state_dict() if counter is not None else None,
+            'output_size': output_size,
+            'saved_at': time.time(),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Write then rename, so a crash mid-save leaves the previous checkpoint intact
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def run_identity(video_path, detector, counter=None, capture=None):
+    identity = {'video': file_digest(video_path, SAMPLE_SIZE), 'detector': detector.fingerprint(),
+                'regions': counter.regions() if counter is not None else None,
+                'capture': capture or None}
+    # Round-trip through JSON so it compares equal to a loaded one
+    return json.loads(json.dumps(identity))
+
+def checkpoint_for(directory, video_path, detector, counter=None, capture=None):
+    # One checkpoint file per video and setup inside directory
+    identity = run_identity(video_path, detector, counter, capture)
+    key = hashlib.blake2b(json.dumps(identity, sort_keys=True).encode(), digest_size=16).hexdigest()
+    return Checkpoint(os.path.join(directory, key + '.json'), identity)
+
+def seek_capture(cap, frame_idx):
+    # Position cap so the next read returns frame_idx. Seeking by frame number is not exact
+    # for every container/codec, so fall back to grabbing from the start when it lands elsewhere.
+    if frame_idx <= 0:
+        return
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_idx):
+        if not cap.grab():
+            raise IOError(f"Video ended before frame {frame_idx}")
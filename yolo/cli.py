@@ -0,0 +1,652 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+import cv2
+from yolo.detector import YOLODetector, DEFAULT_SETTINGS
+from yolo.backends import BACKENDS
+from yolo.pipeline import FramePipeline
+from yolo.counting import (filter_detections, count_detections, draw_detections, draw_regions, draw_roi, draw_counts,
+                           is_count_event)
+from yolo.recorder import VideoRecorder, EventClipRecorder
+from yolo.store import RESOLUTIONS, CountStore, CheckpointedCounts, query_counts, parse_since
+from yolo.weights import YOLO_WEIGHT_URLS, WeightManager
+from yolo.server import LiveServer
+from yolo.autotune import MODEL_MAP, TuneStore, DriftMonitor, MonitoredDetector, tuned_profile
+from yolo.tiling import TiledDetector
+from yolo.cache import DetectionCache
+from yolo.checkpoint import checkpoint_for, seek_capture
+from yolo.capture import CAPTURE_BACKENDS, open_capture
+from yolo.motion import MotionGate, GatedDetector
+from yolo.tracker import TrackingCounter, LineCounter, ZoneCounter
+from yolo.sharding import count_video_sharded
+from yolo.multistream import MultiStreamManager
+from yolo.metrics import MetricsExporter
+from yolo.benchmark import (StubDetector, synthetic_clip, video_clip, run_benchmark, compare, save_result, load_result,
+                            DEFAULT_VIEWPORT)
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(__file__), "yolov8n.pt")
+# Shared with the GUI's auto-tune mode
+DEFAULT_TUNE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "autotune.json")
+
+class CountWriter:
+    # Writes one row per frame as CSV (one column per class) or JSONL.
+    # With tracking, cumulative totals are added as '<total name> <class>' CSV columns
+    # or a 'totals' JSONL field.
+    def __init__(self, stream, fmt, class_names, totals_names=(), header=True):
+        self.stream = stream
+        self.fmt = fmt
+        self.class_names = list(class_names)
+        self.totals_names = list(totals_names)
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.writer(stream)
+        if fmt == 'csv' and header:
+            totals_columns = [f"{name} {c}" for name in self.totals_names for c in self.class_names]
+            self._csv.writerow(['frame', 'time'] + self.class_names + totals_columns)
+
+    def write(self, frame_idx, timestamp, counts, totals=None):
+        if self._csv is not None:
+            row = [frame_idx, f"{timestamp:.3f}"] + [counts.get(c, 0) for c in self.class_names]
+            if totals is not None:
+                row += [totals.get(name, {}).get(c, 0) for name in self.totals_names for c in self.class_names]
+            self._csv.writerow(row)
+        else:
+            record = {'frame': frame_idx, 'time': round(timestamp, 3), 'counts': counts}
+            if totals is not None:
+                record['totals'] = totals
+            self.stream.write(json.dumps(record) + "\n")
+
+def count_video(video_path, detector, selected_classes, writer, batch_size=8, queue_size=16, batch_wait=0.05,
+                annotated_path=None, progress_every=0, counter=None, cache=None, start_frame=0,
+                checkpoint=None, checkpoint_every=1000, capture_options=None, clips_dir=None, clip_pre=2.0,
+                clip_post=3.0, store=None, source=None, start_time=0.0, server=None):
+    # With a checkpoint, progress is saved every checkpoint_every frames (after flushing the
+    # writer's stream) and removed once the whole video has been processed. With a store,
+    # counts are added under source, timestamped start_time plus the frame position. With a
+    # server, counts and annotated frames are published under source.
+    cap = open_capture(video_path, **(capture_options or {}))
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    if cap.scale != 1.0:
+        # Lines, zones and the ROI are given in source pixels
+        if counter is not None:
+            counter.scale(cap.scale)
+        if getattr(detector, 'roi', None) is not None:
+            detector.set_roi(detector.roi * cap.scale)
+    seek_capture(cap, start_frame)
+    # Annotated frames are encoded on recorder threads; 'block' keeps every frame of the file
+    recorder = VideoRecorder(annotated_path, fps, drop_policy='block') if annotated_path else None
+    clips = EventClipRecorder(clips_dir, fps, clip_pre, clip_post) if clips_dir else None
+    prev_counts, prev_totals = {}, None
+    pipeline = FramePipeline(cap.read, detector, queue_size=queue_size, drop_policy='block', batch_size=batch_size,
+                             cache=cache, start_frame=start_frame, max_wait=batch_wait)
+    pipeline.start()
+    frames = 0
+    if store is not None and checkpoint is not None:
+        # Rows after the last checkpoint are dropped with it, as the output file is on resume
+        store = CheckpointedCounts(store)
+    start = time.monotonic()
+    try:
+        for frame_idx, frame, detections in pipeline.results():
+            filtered = filter_detections(detections, selected_classes)
+            totals = counter.update(filtered) if counter is not None else None
+            counts = count_detections(filtered)
+            writer.write(frame_idx, frame_idx / fps if fps else 0.0, counts, totals)
+            if store is not None:
+                store.add(source, start_time + (frame_idx / fps if fps else 0.0), counts, totals)
+            if recorder is not None or clips is not None or server is not None:
+                if counter is not None:
+                    draw_regions(frame, counter)
+                if getattr(detector, 'roi', None) is not None:
+                    draw_roi(frame, detector.roi)
+                draw_counts(draw_detections(frame, filtered), counts, totals)
+                if recorder is not None:
+                    recorder.write(frame)
+                if clips is not None:
+                    clips.add(frame_idx, frame, is_count_event(counts, totals, prev_counts, prev_totals))
+                if server is not None:
+                    server.publish(source, frame_idx, counts, totals, frame)
+                prev_counts, prev_totals = counts, totals
+            frames += 1
+            if checkpoint is not None and (frame_idx + 1) % checkpoint_every == 0:
+                writer.stream.flush()
+                checkpoint.save(frame_idx + 1, counter, writer.stream.tell())
+                if store is not None:
+                    store.commit()
+            if progress_every and frames % progress_every == 0:
+                elapsed = time.monotonic() - start
+                print(f"{frames} frames, {frames / elapsed:.1f} FPS", file=sys.stderr)
+        if checkpoint is not None:
+            checkpoint.remove()
+            if store is not None:
+                store.commit()
+    finally:
+        pipeline.stop()
+        cap.release()
+        if recorder is not None:
+            recorder.close()
+            if recorder.error is not None:
+                print(f"Recording failed: {recorder.error}", file=sys.stderr)
+        if clips is not None:
+            clips.close()
+            print(f"Wrote {len(clips.clips)} event clips to {clips_dir}", file=sys.stderr)
+    return frames
+
+def count_video_parallel(video_path, model_path, selected_classes, writer, workers, batch_size=8, settings=None,
+                         backend='pytorch', store=None, source=None, start_time=0.0, batch_wait=0.05):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    cap.release()
+    frames = 0
+    for frame_idx, counts in count_video_sharded(video_path, model_path, selected_classes,
+                                                 workers=workers, batch_size=batch_size, settings=settings,
+                                                 backend=backend, batch_wait=batch_wait):
+        writer.write(frame_idx, frame_idx / fps if fps else 0.0, counts)
+        if store is not None:
+            store.add(source, start_time + (frame_idx / fps if fps else 0.0), counts)
+        frames += 1
+    return frames
+
+def parse_points(value):
+    # "x1,y1,x2,y2,..." -> [(x1, y1), (x2, y2), ...]
+    values = [float(v) for v in value.split(',')]
+    if len(values) % 2:
+        raise SystemExit(f"Expected an even number of coordinates: {value}")
+    return list(zip(values[0::2], values[1::2]))
+
+def parse_region(value):
+    # "name=x1,y1,x2,y2,..." or just the coordinates
+    name, _, coords = value.rpartition('=')
+    return name, parse_points(coords)
+
+def build_counter(lines, zones):
+    line_counters = []
+    for i, value in enumerate(lines):
+        name, points = parse_region(value)
+        if len(points) != 2:
+            raise SystemExit(f"A counting line needs exactly two points: {value}")
+        line_counters.append(LineCounter(name or f"line{i + 1}", points[0], points[1]))
+    zone_counters = []
+    for i, value in enumerate(zones):
+        name, points = parse_region(value)
+        if len(points) < 3:
+            raise SystemExit(f"A counting zone needs at least three points: {value}")
+        zone_counters.append(ZoneCounter(name or f"zone{i + 1}", points))
+    return TrackingCounter(lines=line_counters, zones=zone_counters)
+
+def parse_classes(value, class_names):
+    if not value:
+        return list(class_names)
+    wanted = [c.strip() for c in value.split(',') if c.strip()]
+    unknown = [c for c in wanted if c not in class_names]
+    if unknown:
+        raise SystemExit(f"Unknown classes: {', '.join(unknown)}")
+    return wanted
+
+def add_detector_arguments(parser):
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="YOLO weights file (default: yolo/yolov8n.pt)")
+    parser.add_argument('--classes', default="", help="Comma-separated class names to count (default: all)")
+    parser.add_argument('--conf', type=float, default=DEFAULT_SETTINGS['conf'], help="Confidence threshold")
+    parser.add_argument('--iou', type=float, default=DEFAULT_SETTINGS['iou'], help="NMS IoU threshold")
+    parser.add_argument('--max-det', type=int, default=DEFAULT_SETTINGS['max_det'], help="Maximum detections per frame")
+    parser.add_argument('--imgsz', type=int, default=DEFAULT_SETTINGS['imgsz'], help="Model input size")
+    parser.add_argument('--backend', choices=list(BACKENDS), default='pytorch',
+                        help="Inference backend; exported models are cached next to the weights")
+    parser.add_argument('--tile', type=int, default=0,
+                        help="Sliced inference on overlapping tiles of this size in pixels (0: whole frame)")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Overlap between neighbouring tiles")
+    parser.add_argument('--auto-tune', type=float, default=None, metavar='FPS',
+                        help="Use the most accurate weights (in --model's directory), input size and backend that "
+                             "reach FPS per stream on this machine; tuned once and stored in --tune-file")
+    add_tune_arguments(parser)
+
+def add_tune_arguments(parser):
+    parser.add_argument('--tune-file', default=DEFAULT_TUNE_FILE, help="Stored auto-tune results per machine")
+    parser.add_argument('--tune-sizes', default="320,480,640", help="Input sizes to try when tuning")
+    parser.add_argument('--tune-backends', default="pytorch", help="Backends to try when tuning, comma-separated")
+    parser.add_argument('--tune-clip', default=None, help="Sample clip for tuning (default: the input video "
+                                                         "if there is one, else synthetic frames)")
+    parser.add_argument('--tune-frames', type=int, default=60, help="Frames profiled per configuration")
+
+def add_capture_arguments(parser):
+    parser.add_argument('--capture', choices=list(CAPTURE_BACKENDS), default='auto',
+                        help="Capture backend ('pyav' needs the PyAV package)")
+    parser.add_argument('--decode-threads', type=int, default=0, help="Decoder threads (0: library default)")
+    parser.add_argument('--buffer-size', type=int, default=0, help="Capture buffer size in frames (0: default)")
+    parser.add_argument('--decode-max-size', type=int, default=None,
+                        help="Downscale frames after decoding so the longer side is at most this many pixels")
+    parser.add_argument('--hw-decode', action='store_true', help="Use hardware decoding when available")
+
+def capture_options(args):
+    return {'backend': args.capture, 'threads': args.decode_threads, 'buffer_size': args.buffer_size,
+            'max_size': args.decode_max_size, 'hw_accel': args.hw_decode}
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics-jsonl', default=None, help="Append pipeline metrics snapshots to this JSONL file")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-interval', type=float, default=5.0, help="Seconds between JSONL snapshots")
+
+def start_metrics(args):
+    if not args.metrics_jsonl and args.metrics_port is None:
+        return None
+    exporter = MetricsExporter(jsonl_path=args.metrics_jsonl, port=args.metrics_port, interval=args.metrics_interval)
+    exporter.start()
+    return exporter
+
+def stop_metrics(exporter):
+    if exporter is not None:
+        exporter.stop()
+        exporter.join()
+
+def add_server_arguments(parser):
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT',
+                        help="Publish live counts (JSON/SSE/WebSocket) and annotated MJPEG on this port")
+    parser.add_argument('--serve-host', default='127.0.0.1', help="Interface for --serve")
+
+def start_server(args):
+    if args.serve is None:
+        return None
+    server = LiveServer(args.serve_host, args.serve)
+    if server.error is not None:
+        raise SystemExit(f"Could not start the live server: {server.error}")
+    print(f"Serving live counts on http://{args.serve_host}:{server.port}/", file=sys.stderr)
+    return server
+
+def detector_settings(args):
+    return {'conf': args.conf, 'iou': args.iou, 'max_det': args.max_det, 'imgsz': args.imgsz}
+
+def tune_models(directory):
+    return [os.path.join(directory, name) for name in MODEL_MAP if os.path.exists(os.path.join(directory, name))]
+
+def auto_tune(args, streams=1, retune=False, models_dir=None):
+    clip = args.tune_clip or getattr(args, 'video', None)
+    def sample_frames():
+        if clip:
+            return list(video_clip(clip, args.tune_frames))
+        return list(synthetic_clip(args.tune_frames, 1280, 720))
+    models = tune_models(models_dir or os.path.dirname(os.path.abspath(args.model)))
+    if not models:
+        raise SystemExit("No YOLOv8 weights to tune with; download some with 'python -m yolo.cli weights'")
+    def progress(message):
+        print(message, file=sys.stderr)
+    return tuned_profile(TuneStore(args.tune_file), models, args.auto_tune, streams, sample_frames, retune,
+                         sizes=[int(s) for s in args.tune_sizes.split(',')],
+                         backends=[b.strip() for b in args.tune_backends.split(',')], progress=progress)
+
+def report_drift(args):
+    # Marks the auto-tune result stale when the model ran clearly slower than when it was tuned
+    profile, monitor = getattr(args, 'drift', (None, None))
+    if monitor is not None and monitor.drifted:
+        TuneStore(args.tune_file).mark_stale(profile, monitor.measured_ms)
+        print(f"Model time per frame drifted to {monitor.measured_ms:.1f} ms (tuned: {profile['ms_per_image']:.1f} ms); "
+              "the next --auto-tune run tunes again", file=sys.stderr)
+
+def load_detector(args, streams=1):
+    # Returns the detector, restricted to the requested classes, and the class names
+    if getattr(args, 'auto_tune', None):
+        profile = auto_tune(args, streams)
+        print(f"Auto-tune: {os.path.basename(profile['model_path'])} on {profile['backend']} at {profile['imgsz']}px, "
+              f"{profile['fps']:.1f} FPS" + ("" if profile['met'] else " (below the target)"), file=sys.stderr)
+        settings = dict(detector_settings(args), imgsz=profile['imgsz'])
+        monitor = DriftMonitor(profile['ms_per_image'])
+        args.drift = (profile, monitor)
+        detector = MonitoredDetector(YOLODetector(profile['model_path'], backend=profile['backend'], **settings),
+                                     monitor)
+    else:
+        detector = YOLODetector(args.model, backend=args.backend, **detector_settings(args))
+    classes = parse_classes(args.classes, list(detector.names.values()))
+    detector.set_classes(classes)
+    if args.tile:
+        detector = TiledDetector(detector, args.tile, args.tile_overlap)
+    return detector, classes
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m yolo.cli", description="ObjShomar headless object counter")
+    sub = parser.add_subparsers(dest='command', required=True)
+    count = sub.add_parser('count', help="Count objects in a video file, one output row per frame")
+    count.add_argument('video', help="Input video file")
+    add_detector_arguments(count)
+    count.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    count.add_argument('--output', '-o', default='-', help="Output file (default: stdout)")
+    count.add_argument('--annotated', default=None, help="Also write the annotated video to this path")
+    count.add_argument('--event-clips', default=None,
+                       help="Write short annotated clips around count events to this directory")
+    count.add_argument('--clip-pre', type=float, default=2.0, help="Seconds before an event in each clip")
+    count.add_argument('--clip-post', type=float, default=3.0, help="Seconds after the last event in each clip")
+    count.add_argument('--batch-size', type=int, default=8, help="Frames per model call")
+    count.add_argument('--batch-wait', type=float, default=0.05,
+                       help="Seconds to wait for a batch to fill once its first frame is decoded")
+    count.add_argument('--queue-size', type=int, default=16, help="Depth of the decode/inference queues")
+    count.add_argument('--progress', type=int, default=0, help="Print throughput to stderr every N frames")
+    count.add_argument('--workers', type=int, default=1,
+                       help="Split the video into segments processed by this many worker processes")
+    add_metrics_arguments(count)
+    add_capture_arguments(count)
+    count.add_argument('--track', action='store_true',
+                       help="Track objects and add cumulative unique/line/zone totals to the output")
+    count.add_argument('--line', action='append', default=[],
+                       help="Counting line as [name=]x1,y1,x2,y2 (implies --track, repeatable)")
+    count.add_argument('--zone', action='append', default=[],
+                       help="Counting zone as [name=]x1,y1,x2,y2,x3,y3,... (implies --track, repeatable)")
+    count.add_argument('--motion-gate', choices=['diff', 'mog2'], default=None,
+                       help="Skip inference on frames without motion, reusing the last detections")
+    count.add_argument('--motion-max-skip', type=int, default=30,
+                       help="Run inference at least every N frames when motion gating")
+    count.add_argument('--cache-dir', default=None,
+                       help="Cache all-class detections here; re-runs with other --classes skip inference")
+    count.add_argument('--cache-max-gb', type=float, default=2.0, help="Evict least recently used cache entries above this")
+    count.add_argument('--checkpoint-dir', default=None,
+                       help="Save progress here and resume an interrupted run, appending to --output")
+    count.add_argument('--checkpoint-every', type=int, default=1000, help="Frames between checkpoints")
+    count.add_argument('--roi', default=None,
+                       help="Only detect inside this polygon x1,y1,x2,y2,x3,y3,... (crops before inference)")
+    count.add_argument('--store', default=None, help="Also add the counts to this SQLite count store")
+    count.add_argument('--source', default=None, help="Source name in the count store (default: video file name)")
+    add_server_arguments(count)
+    count.add_argument('--start-time', default=None,
+                       help="Wall-clock time of the first frame for the count store, e.g. 2024-05-01T08:00 "
+                            "(default: now)")
+    streams = sub.add_parser('streams', help="Count objects on many camera links with one shared model")
+    streams.add_argument('sources', nargs='+',
+                         help="Camera URLs, or a text file with one URL (optionally 'name url') per line")
+    add_detector_arguments(streams)
+    add_metrics_arguments(streams)
+    add_capture_arguments(streams)
+    streams.add_argument('--output', '-o', default='-', help="JSONL output file (default: stdout)")
+    streams.add_argument('--batch-size', type=int, default=8, help="Maximum frames (one per stream) per model call")
+    streams.add_argument('--store', default=None, help="Also add the counts to this SQLite count store")
+    add_server_arguments(streams)
+    query = sub.add_parser('query', help="Print counts over time from a count store")
+    query.add_argument('store', help="SQLite count store written with --store")
+    query.add_argument('--source', default=None, help="Only this source (video file name or stream name)")
+    query.add_argument('--kind', default='count',
+                       help="'count' for objects in view, or a total: 'unique', '<line> in', '<line> out', zone name")
+    query.add_argument('--class', dest='class_name', default=None, help="Only this class")
+    query.add_argument('--since', default=None, help="Start of the range, e.g. 90s, 15m, 6h, 7d ago")
+    query.add_argument('--until', default=None, help="End of the range, same format as --since (default: now)")
+    query.add_argument('--resolution', choices=list(RESOLUTIONS), default='hour', help="Bucket size")
+    query.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    weights = sub.add_parser('weights', help="Download and verify model weights, e.g. to provision machines")
+    weights.add_argument('names', nargs='+', help=f"Weight files ({', '.join(YOLO_WEIGHT_URLS)}) or name=URL")
+    weights.add_argument('--dest', default=os.path.dirname(__file__), help="Directory to put the weights in")
+    weights.add_argument('--cache-dir', action='append', default=[],
+                         help="Shared weight directory to copy from and fill (repeatable, first one is filled)")
+    weights.add_argument('--mirror', action='append', default=[],
+                         help="Base URL serving a weight directory, tried before the original URL (repeatable)")
+    weights.add_argument('--sha256', action='append', default=[], help="Expected hash as name=hex (repeatable)")
+    weights.add_argument('--connections', type=int, default=4, help="Parallel ranged connections per download")
+    tune = sub.add_parser('tune', help="Pick the most accurate model/input size/backend that reaches a target FPS")
+    tune.add_argument('--target-fps', dest='auto_tune', type=float, required=True, metavar='FPS', help="Required FPS per stream")
+    tune.add_argument('--streams', type=int, default=1, help="Number of streams processed at the same time")
+    tune.add_argument('--models-dir', default=os.path.dirname(os.path.abspath(__file__)),
+                      help="Directory with the YOLOv8 weights to try")
+    tune.add_argument('--retune', action='store_true', help="Tune again even if a stored result exists")
+    tune.add_argument('--model', default=DEFAULT_MODEL, help=argparse.SUPPRESS)
+    add_tune_arguments(tune)
+    bench = sub.add_parser('bench', help="Measure per-stage timings, FPS and latency of the detection loop")
+    bench.add_argument('video', nargs='?', default=None, help="Recorded clip (default: synthetic frames)")
+    add_detector_arguments(bench)
+    bench.add_argument('--stub', action='store_true', help="Use a stub detector instead of loading weights")
+    bench.add_argument('--stub-boxes', type=int, default=20, help="Boxes per frame returned by the stub detector")
+    bench.add_argument('--stub-latency', type=float, default=0.0, help="Simulated stub inference time per frame (s)")
+    bench.add_argument('--frames', type=int, default=300, help="Number of frames to run")
+    bench.add_argument('--width', type=int, default=1280, help="Synthetic frame width")
+    bench.add_argument('--height', type=int, default=720, help="Synthetic frame height")
+    bench.add_argument('--view-width', type=int, default=DEFAULT_VIEWPORT[0], help="Display size frames are rendered for")
+    bench.add_argument('--view-height', type=int, default=DEFAULT_VIEWPORT[1], help="Display size frames are rendered for")
+    bench.add_argument('--batch-size', type=int, default=1, help="Frames per model call")
+    bench.add_argument('--batch-wait', type=float, default=0.0,
+                       help="Seconds to wait for a batch to fill once its first frame is decoded")
+    bench.add_argument('--warmup', type=int, default=5, help="Frames run before measuring")
+    bench.add_argument('--track', action='store_true', help="Include object tracking in the count stage")
+    bench.add_argument('--no-draw', action='store_true', help="Skip drawing boxes and labels")
+    bench.add_argument('--output', '-o', default=None, help="Write the JSON result to this file")
+    bench.add_argument('--compare', default=None, help="Earlier JSON result to compare against")
+    return parser
+
+def run_count(args):
+    if args.workers > 1 and (args.annotated or args.event_clips or args.serve is not None):
+        raise SystemExit("--annotated, --event-clips and --serve are not supported together with --workers")
+    counter = build_counter(args.line, args.zone) if args.track or args.line or args.zone else None
+    if args.workers > 1 and counter is not None:
+        raise SystemExit("Tracking is not supported together with --workers")
+    if args.workers > 1 and (args.motion_gate or args.roi or args.tile or args.cache_dir or args.checkpoint_dir
+                             or args.capture != 'auto' or args.decode_max_size or args.auto_tune):
+        raise SystemExit("--motion-gate, --roi, --tile, --cache-dir, --checkpoint-dir, --capture, "
+                         "--decode-max-size and --auto-tune are not supported together with --workers")
+    if args.checkpoint_dir and (args.output == '-' or args.annotated):
+        raise SystemExit("--checkpoint-dir needs an --output file and does not support --annotated")
+    roi = parse_points(args.roi) if args.roi else None
+    if roi is not None and len(roi) < 3:
+        raise SystemExit(f"A region of interest needs at least three points: {args.roi}")
+    detector, classes = load_detector(args)
+    if args.motion_gate or roi is not None:
+        gate = MotionGate(args.motion_gate, max_skip=args.motion_max_skip) if args.motion_gate else None
+        detector = GatedDetector(detector, gate, roi)
+    # Cache entries and checkpoints depend on the decoded frame size, not on the other capture options
+    decoded = {'max_size': args.decode_max_size}
+    cache = None
+    if args.cache_dir:
+        cache = DetectionCache(args.cache_dir, int(args.cache_max_gb * 1024 ** 3)).entry(args.video, detector, decoded)
+    checkpoint = checkpoint_for(args.checkpoint_dir, args.video, detector, counter, decoded) if args.checkpoint_dir else None
+    state = checkpoint.load() if checkpoint is not None else None
+    source = args.source or os.path.basename(args.video)
+    start_time = datetime.datetime.fromisoformat(args.start_time).timestamp() if args.start_time else time.time()
+    if state is not None and os.path.exists(args.output) and os.path.getsize(args.output) >= state['output_size']:
+        # Resume: drop rows written after the checkpoint, then append
+        out = open(args.output, 'r+', newline='')
+        out.truncate(state['output_size'])
+        out.seek(state['output_size'])
+        if counter is not None:
+            counter.load_state_dict(state['counter'])
+        print(f"Resuming from frame {state['next_frame']}", file=sys.stderr)
+    else:
+        state = None
+        out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    store = None
+    if args.store:
+        store = CountStore(args.store)
+        store.reset_totals(source, counter.totals() if state is not None and counter is not None else None)
+        store.start()
+    server = start_server(args)
+    exporter = start_metrics(args)
+    try:
+        totals_names = list(counter.totals()) if counter is not None else []
+        writer = CountWriter(out, args.format, classes, totals_names, header=state is None)
+        start = time.monotonic()
+        if args.workers > 1:
+            settings = dict(detector_settings(args), classes=detector.settings['classes'])
+            frames = count_video_parallel(args.video, args.model, set(classes), writer, args.workers,
+                                          batch_size=args.batch_size, settings=settings, backend=args.backend,
+                                          store=store, source=source, start_time=start_time,
+                                          batch_wait=args.batch_wait)
+        else:
+            frames = count_video(args.video, detector, set(classes), writer, batch_size=args.batch_size,
+                                 queue_size=args.queue_size, batch_wait=args.batch_wait, annotated_path=args.annotated,
+                                 progress_every=args.progress, counter=counter, cache=cache,
+                                 start_frame=state['next_frame'] if state else 0, checkpoint=checkpoint,
+                                 checkpoint_every=args.checkpoint_every, capture_options=capture_options(args),
+                                 clips_dir=args.event_clips, clip_pre=args.clip_pre, clip_post=args.clip_post,
+                                 store=store, source=source, start_time=start_time, server=server)
+        elapsed = time.monotonic() - start
+        print(f"Processed {frames} frames in {elapsed:.1f}s ({frames / max(elapsed, 1e-9):.1f} FPS)", file=sys.stderr)
+        if args.motion_gate:
+            stats = detector.gate.stats()
+            print(f"Motion gating skipped {stats['skipped']} of {stats['checked']} frames", file=sys.stderr)
+    finally:
+        stop_metrics(exporter)
+        report_drift(args)
+        if store is not None:
+            store.stop()
+        if server is not None:
+            server.stop()
+        if cache is not None:
+            cache.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def read_sources(values):
+    sources = {}
+    for value in values:
+        if os.path.isfile(value):
+            with open(value) as f:
+                for line in f:
+                    parts = line.split()
+                    if not parts or parts[0].startswith('#'):
+                        continue
+                    name, url = (parts[0], parts[1]) if len(parts) > 1 else (str(len(sources)), parts[0])
+                    sources[name] = url
+        else:
+            sources[str(len(sources))] = value
+    return sources
+
+def run_streams(args):
+    sources = read_sources(args.sources)
+    detector, classes = load_detector(args, streams=len(sources))
+    out = sys.stdout if args.output == '-' else open(args.output, 'a')
+    store = CountStore(args.store) if args.store else None
+    if store is not None:
+        store.start()
+    server = start_server(args)
+    def on_result(stream, frame_idx, frame, detections, counts):
+        now = time.time()
+        line = json.dumps({'stream': stream, 'frame': frame_idx, 'time': round(now, 3), 'counts': counts})
+        out.write(line + "\n")
+        out.flush()
+        if store is not None:
+            store.add(stream, now, counts)
+        if server is not None:
+            server.publish(stream, frame_idx, counts, frame=draw_counts(draw_detections(frame, detections), counts))
+    manager = MultiStreamManager(detector, sources, set(classes),
+                                 batch_size=args.batch_size, on_result=on_result,
+                                 capture_options=capture_options(args))
+    exporter = start_metrics(args)
+    manager.start()
+    try:
+        while manager.is_alive():
+            manager.join(0.5)
+    except KeyboardInterrupt:
+        manager.stop()
+        manager.join()
+    finally:
+        stop_metrics(exporter)
+        report_drift(args)
+        if store is not None:
+            store.stop()
+        if server is not None:
+            server.stop()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def run_query(args):
+    now = time.time()
+    start = parse_since(args.since, now) if args.since else None
+    end = parse_since(args.until, now) if args.until else None
+    rows = query_counts(args.store, args.source, args.kind, args.class_name, start, end, args.resolution)
+    # Averages are over every frame of the bucket, including frames without the class
+    frames = {(source, bucket): n for source, _, bucket, n, _, _ in
+              query_counts(args.store, args.source, 'frames', None, start, end, args.resolution)}
+    if args.format == 'csv':
+        out = csv.writer(sys.stdout)
+        out.writerow(['source', 'class', 'time', 'total', 'peak', 'mean'])
+    for source, class_name, bucket, total, peak, _ in rows:
+        when = datetime.datetime.fromtimestamp(bucket).isoformat()
+        mean = round(total / max(frames.get((source, bucket), 1), 1), 3)
+        if args.format == 'csv':
+            out.writerow([source, class_name, when, total, peak, mean])
+        else:
+            print(json.dumps({'source': source, 'class': class_name, 'time': when, 'total': total,
+                              'peak': peak, 'mean': mean}))
+    return 0
+
+def run_weights(args):
+    manager = WeightManager(args.dest, args.cache_dir, args.mirror, connections=args.connections)
+    hashes = dict(value.split('=', 1) for value in args.sha256)
+    for value in args.names:
+        name, _, url = value.partition('=')
+        def progress(done, total):
+            if total:
+                print(f"\r{name}: {done * 100 // total}%", end='', file=sys.stderr)
+        try:
+            path = manager.fetch(name, url or YOLO_WEIGHT_URLS.get(name), hashes.get(name), progress)
+        except (OSError, ValueError) as e:
+            print(f"\n{name}: {e}", file=sys.stderr)
+            return 1
+        print(f"\r{name}: {path}", file=sys.stderr)
+    return 0
+
+def run_tune(args):
+    profile = auto_tune(args, args.streams, args.retune, args.models_dir)
+    for r in profile['results']:
+        status = f"{r['fps']:8.1f} FPS" if 'fps' in r else f"error: {r['error']}"
+        print(f"  {os.path.basename(r['model_path']):<12} {r['backend']:<14} {r['imgsz']:>5}px {status}")
+    print(f"{os.path.basename(profile['model_path'])} on {profile['backend']} at {profile['imgsz']}px: "
+          f"{profile['fps']:.1f} FPS for {args.streams} x {args.auto_tune:g} FPS"
+          + ("" if profile['met'] else " (no configuration reaches the target; this is the fastest)"))
+    return 0
+
+def run_bench(args):
+    if args.stub:
+        detector = StubDetector(args.stub_boxes, args.stub_latency)
+        classes = parse_classes(args.classes, list(detector.names.values()))
+        if args.tile:
+            detector = TiledDetector(detector, args.tile, args.tile_overlap)
+    else:
+        detector, classes = load_detector(args)
+    def clip(num_frames):
+        if args.video:
+            return video_clip(args.video, num_frames)
+        return synthetic_clip(num_frames, args.width, args.height)
+    if args.warmup:
+        run_benchmark(clip(args.warmup), detector, classes, batch_size=args.batch_size, max_wait=args.batch_wait)
+    result = run_benchmark(clip(args.frames), detector, classes, batch_size=args.batch_size, max_wait=args.batch_wait,
+                           track=args.track, draw=not args.no_draw, viewport=(args.view_width, args.view_height))
+    result['config'] = {
+        'video': args.video or f"synthetic {args.width}x{args.height}",
+        'model': 'stub' if args.stub else args.model,
+        'backend': 'stub' if args.stub else args.backend,
+        'batch_size': args.batch_size,
+        'batch_wait': args.batch_wait,
+        'tile': args.tile,
+        'track': args.track,
+        'draw': not args.no_draw,
+        'viewport': [args.view_width, args.view_height],
+        'settings': {k: v for k, v in detector.settings.items() if k != 'classes'},
+    }
+    print(f"{result['frames']} frames, {result['fps']:.1f} FPS, latency p50/p95/p99: "
+          f"{result['latency']['p50_ms']:.1f}/{result['latency']['p95_ms']:.1f}/{result['latency']['p99_ms']:.1f} ms")
+    for stage, stats in result['stages'].items():
+        print(f"  {stage:<12} mean {stats['mean_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms")
+    if args.compare:
+        for line in compare(result, load_result(args.compare)):
+            print(line)
+    if args.output:
+        save_result(result, args.output)
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'count':
+        return run_count(args)
+    if args.command == 'streams':
+        return run_streams(args)
+    if args.command == 'query':
+        return run_query(args)
+    if args.command == 'weights':
+        return run_weights(args)
+    if args.command == 'tune':
+        return run_tune(args)
+    if args.command == 'bench':
+        return run_bench(args)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import cv2
+from yolo.overlay import default_renderer
+
+def filter_detections(detections, selected_classes):
+    # Keep only detections whose class name is in selected_classes
+    return detections.filter_names(selected_classes)
+
+def count_detections(detections):
+    return detections.counts()
+
+def draw_detections(frame, detections, scale=1.0, offset=(0, 0)):
+    # Draw boxes and labels in place; scale/offset map source coordinates onto a resized frame
+    return default_renderer.draw(frame, detections, scale, offset)
+
+def draw_regions(frame, counter):
+    # Draw the counting lines and zones of a TrackingCounter
+    for line in counter.lines:
+        p1 = tuple(int(v) for v in line.p1)
+        p2 = tuple(int(v) for v in line.p2)
+        cv2.line(frame, p1, p2, (0,0,255), 2)
+        cv2.putText(frame, line.name, p1, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
+    for zone in counter.zones:
+        pts = zone.polygon.astype('int32').reshape(-1, 1, 2)
+        cv2.polylines(frame, [pts], True, (255,0,0), 2)
+        cv2.putText(frame, zone.name, tuple(int(v) for v in zone.polygon[0]), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,0,0), 2)
+    return frame
+
+def draw_roi(frame, polygon):
+    pts = polygon.astype('int32').reshape(-1, 1, 2)
+    cv2.polylines(frame, [pts], True, (0,255,255), 2)
+    return frame
+
+def draw_counts(frame, counts, totals=None):
+    # Current counts (and cumulative totals) as text in the top left corner, for recordings
+    lines = [", ".join(f"{k}: {v}" for k, v in counts.items()) or "Object Count: 0"]
+    if totals:
+        lines.append(format_totals(totals))
+    for i, text in enumerate(lines):
+        y = 25 + i * 25
+        cv2.putText(frame, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 4)
+        cv2.putText(frame, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
+    return frame
+
+def is_count_event(counts, totals, prev_counts, prev_totals):
+    # With tracking an event is any change in the cumulative totals, otherwise a class count going up
+    if totals is not None:
+        return prev_totals is not None and totals != prev_totals
+    return any(v > prev_counts.get(k, 0) for k, v in counts.items())
+
+def format_totals(totals):
+    parts = []
+    for name, counts in totals.items():
+        if counts:
+            parts.append(f"{name}: " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+    return " | ".join(parts)
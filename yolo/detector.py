@@ -1,23 +1,103 @@
-from ultralytics import YOLO
+import time
 import numpy as np
+from yolo.results import Detections
+from yolo.backends import resolve_model, supports_batch
+from yolo.digest import file_digest
+
+DEFAULT_SETTINGS = {
+    'classes': None,  # class IDs to keep, None for all
+    'conf': 0.25,
+    'iou': 0.7,
+    'max_det': 300,
+    'imgsz': 640,
+}
 
 class YOLODetector:
-    def __init__(self, model_path='yolov8n.pt'):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov8n.pt', backend='pytorch', **settings):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.backend = backend
+        self.last_timings = {}
+        # Exported backends have a fixed input size, chosen when the model is loaded
+        self.fixed_imgsz = None
+        self.configure(**settings)
+        if backend != 'pytorch':
+            self.fixed_imgsz = self.settings['imgsz']
+        self.model_path = resolve_model(model_path, backend, self.settings['imgsz'])
+        # Imported here so tools that never load weights (e.g. bench --stub) work without ultralytics
+        from ultralytics import YOLO
+        self.model = YOLO(self.model_path, task='detect')
+
+    @property
+    def names(self):
+        return self.model.names if hasattr(self.model, 'names') else {}
+
+    def configure(self, **settings):
+        # Inference settings are applied inside the model call (class filtering happens before
+        # NMS), so they can be changed at runtime without reloading the weights
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown detector settings: {', '.join(sorted(unknown))}")
+        new_settings = dict(self.settings)
+        new_settings.update(settings)
+        if new_settings['classes'] is not None:
+            new_settings['classes'] = sorted(int(c) for c in new_settings['classes'])
+        if self.fixed_imgsz is not None:
+            new_settings['imgsz'] = self.fixed_imgsz
+        # Replace the dict in one step so a detect call on another thread sees old or new settings
+        self.settings = new_settings
+
+    def class_ids_for(self, class_names):
+        return [i for i, name in self.names.items() if name in class_names]
+
+    def set_classes(self, class_names):
+        # Restrict inference to the given class names; all classes selected means no filter
+        ids = self.class_ids_for(class_names)
+        self.configure(classes=None if len(ids) == len(self.names) else ids)
+
+    def warmup(self, batch_size=1):
+        # One dummy inference so model setup, graph compilation and allocations happen now
+        # rather than on the first real frame
+        imgsz = self.settings['imgsz']
+        self.detect_batch([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * batch_size)
 
     def detect(self, frame: np.ndarray):
-        # Run detection
-        results = self.model(frame)
-        detections = []
-        for r in results:
-            boxes = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, 'xyxy') else []
-            confs = r.boxes.conf.cpu().numpy() if hasattr(r.boxes, 'conf') else []
-            clss = r.boxes.cls.cpu().numpy() if hasattr(r.boxes, 'cls') else []
-            for box, conf, cls in zip(boxes, confs, clss):
-                detections.append({
-                    'box': box,  # [x1, y1, x2, y2]
-                    'conf': float(conf),
-                    'class_id': int(cls),
-                    'class_name': self.model.names[int(cls)] if hasattr(self.model, 'names') else str(cls)
-                })
-        return detections 
\ No newline at end of file
+        return self.detect_batch([frame])[0]
+
+    def fingerprint(self):
+        # What determines the detections apart from the class filter (see yolo/cache.py)
+        return {'weights': file_digest(self.model_path), 'backend': self.backend,
+                'settings': {k: v for k, v in self.settings.items() if k != 'classes'}}
+
+    def detect_batch(self, frames, **overrides):
+        # Run detection on all frames in a single model call, one Detections per frame.
+        # overrides replace settings for this call only (e.g. classes=None for the cache)
+        if len(frames) == 0:
+            return []
+        settings = dict(self.settings, **overrides) if overrides else self.settings
+        if supports_batch(self.backend):
+            results = self.model(list(frames), verbose=False, **settings)
+        else:
+            # Static-batch exports take one frame per call
+            results = [r for frame in frames for r in self.model(frame, verbose=False, **settings)]
+        start = time.perf_counter()
+        detections = [self._unpack(r) for r in results]
+        unpack_time = time.perf_counter() - start
+        # Seconds spent in each stage for the whole batch; ultralytics reports ms per image
+        self.last_timings = {
+            'preprocess': sum(r.speed.get('preprocess') or 0 for r in results) / 1000,
+            'inference': sum(r.speed.get('inference') or 0 for r in results) / 1000,
+            'postprocess': sum(r.speed.get('postprocess') or 0 for r in results) / 1000 + unpack_time,
+        }
+        return detections
+
+    def _unpack(self, r):
+        boxes = r.boxes
+        return Detections(
+            boxes=boxes.xyxy.cpu().numpy(),  # [x1, y1, x2, y2]
+            conf=boxes.conf.cpu().numpy(),
+            class_id=boxes.cls.cpu().numpy().astype(np.int64),
+            names=self.names)
+
+    def detect_dicts(self, frame: np.ndarray):
+        # Old per-box dict form
+        return self.detect(frame).to_dicts()
@@ -0,0 +1,106 @@
+import threading
+import cv2
+from yolo.counting import draw_detections
+
+class DisplayView:
+    # Viewport size and zoom/pan shared between the GUI thread (which changes them) and the
+    # video thread (which renders only what is visible). Pan is in pixels of the zoomed image.
+    def __init__(self, min_zoom=1.0, max_zoom=5.0):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        self.view_w = 0
+        self.view_h = 0
+        self.zoom = 1.0
+        self.pan_x = 0
+        self.pan_y = 0
+
+    def set_viewport(self, width, height):
+        with self._lock:
+            self.view_w = int(width)
+            self.view_h = int(height)
+
+    def zoom_by(self, factor):
+        with self._lock:
+            self.zoom = max(self.min_zoom, min(self.zoom * factor, self.max_zoom))
+            if self.zoom == self.min_zoom:
+                self.pan_x = 0
+                self.pan_y = 0
+            return self.zoom
+
+    def pan_by(self, dx, dy):
+        with self._lock:
+            self.pan_x -= dx
+            self.pan_y -= dy
+
+    def reset(self):
+        with self._lock:
+            self.zoom = 1.0
+            self.pan_x = 0
+            self.pan_y = 0
+
+    def snapshot(self):
+        with self._lock:
+            return self.view_w, self.view_h, self.zoom, self.pan_x, self.pan_y
+
+    def set_pan(self, pan_x, pan_y):
+        with self._lock:
+            self.pan_x = pan_x
+            self.pan_y = pan_y
+
+def render_view(frame, view_w, view_h, zoom=1.0, pan_x=0, pan_y=0, detections=None):
+    # Crop the visible region of a BGR frame and resize it to at most the viewport size.
+    # At zoom 1 the whole frame is fitted into the viewport. Returns (image, pan_x, pan_y)
+    # with the pan clamped to the zoomed image. detections (in frame coordinates) are drawn
+    # on the resized image, so boxes and labels are rendered at display resolution.
+    h, w = frame.shape[:2]
+    if view_w <= 0 or view_h <= 0:
+        if detections is not None:
+            frame = draw_detections(frame.copy(), detections)
+        return frame, 0, 0
+    scale = min(view_w / w, view_h / h) * zoom
+    scaled_w = max(1, int(w * scale))
+    scaled_h = max(1, int(h * scale))
+    pan_x = min(max(pan_x, 0), max(0, scaled_w - view_w))
+    pan_y = min(max(pan_y, 0), max(0, scaled_h - view_h))
+    out_w = min(scaled_w, view_w)
+    out_h = min(scaled_h, view_h)
+    # Source rectangle that maps onto the visible part of the zoomed image
+    x0 = int(pan_x / scale)
+    y0 = int(pan_y / scale)
+    x1 = min(w, max(x0 + 1, int((pan_x + out_w) / scale)))
+    y1 = min(h, max(y0 + 1, int((pan_y + out_h) / scale)))
+    region = frame[y0:y1, x0:x1]
+    if region.shape[1] == out_w and region.shape[0] == out_h:
+        image = region.copy()
+    else:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        image = cv2.resize(region, (out_w, out_h), interpolation=interpolation)
+    if detections is not None:
+        draw_detections(image, detections, scale, (pan_x, pan_y))
+    return image, pan_x, pan_y
+
+def display_to_frame(x, y, frame_shape, view_w, view_h, zoom=1.0, pan_x=0, pan_y=0):
+    # Map a point on the image produced by render_view back to source frame coordinates
+    h, w = frame_shape[:2]
+    scale = min(view_w / w, view_h / h) * zoom if view_w > 0 and view_h > 0 else 1.0
+    return (min(max((x + pan_x) / scale, 0), w), min(max((y + pan_y) / scale, 0), h))
+
+class LatestFrameSlot:
+    # Single-frame mailbox between the video thread and the GUI. put() overwrites whatever
+    # the GUI has not shown yet and returns True only when the slot was empty, so at most one
+    # "frame ready" signal is queued no matter how far behind the GUI is.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+
+    def put(self, frame):
+        with self._lock:
+            was_empty = self._frame is None
+            self._frame = frame
+            return was_empty
+
+    def take(self):
+        with self._lock:
+            frame, self._frame = self._frame, None
+            return frame
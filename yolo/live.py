@@ -0,0 +1,88 @@
+import threading
+import time
+from yolo.metrics import metrics
+
+class LatestFrameGrabber(threading.Thread):
+    # Drains a live capture on its own thread so OpenCV's internal buffer never backs up.
+    # Every frame is grab()bed, but only the frame a consumer asks for is retrieve()d (decoded
+    # to BGR), so read() always returns the newest frame. Frames never handed out are counted.
+    def __init__(self, cap, ready_event=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        # Optional event set whenever a requested frame becomes available
+        self.ready_event = ready_event
+        self.grabbed = 0
+        self.delivered = 0
+        self._cond = threading.Condition()
+        self._wanted = False
+        self._frame = None
+        self._frame_time = 0.0
+        self._ended = False
+        self._stopped = False
+
+    @property
+    def dropped(self):
+        return max(0, self.grabbed - self.delivered)
+
+    def run(self):
+        while not self._stopped:
+            if not self.cap.grab():
+                break
+            grab_time = time.monotonic()
+            metrics.count('frames_read')
+            with self._cond:
+                self.grabbed += 1
+                if self._wanted:
+                    t = metrics.start()
+                    ret, frame = self.cap.retrieve()
+                    metrics.stop('decode', t)
+                    if not ret:
+                        break
+                    self._frame = frame
+                    self._frame_time = grab_time
+                    self._wanted = False
+                    self._cond.notify_all()
+                    if self.ready_event is not None:
+                        self.ready_event.set()
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+        if self.ready_event is not None:
+            self.ready_event.set()
+
+    @property
+    def ended(self):
+        return self._ended or self._stopped
+
+    def request(self):
+        # Ask for the next grabbed frame without waiting for it; pick it up with take()
+        with self._cond:
+            if self._frame is None:
+                self._wanted = True
+
+    def take(self):
+        # Non-blocking: returns (ret, frame, grab_time) if a requested frame is ready
+        with self._cond:
+            if self._frame is None:
+                return False, None, 0.0
+            frame, self._frame = self._frame, None
+            self.delivered += 1
+            return True, frame, self._frame_time
+
+    def read(self, timeout=None):
+        # Returns (ret, frame, grab_time) for the next frame grabbed after the call
+        with self._cond:
+            self._wanted = True
+            self._frame = None
+            ready = self._cond.wait_for(lambda: self._frame is not None or self._ended or self._stopped, timeout)
+            if not ready or self._frame is None:
+                self._wanted = False
+                return False, None, 0.0
+            frame, self._frame = self._frame, None
+            self.delivered += 1
+            return True, frame, self._frame_time
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
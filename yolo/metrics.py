@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    # Cheap counters, gauges and stage timers for the hot path.
+    # Every call returns immediately while disabled, so instrumentation can stay in place.
+    # Timers keep count, total, max and a moving average of recent values.
+    def __init__(self, enabled=False, smoothing=0.1):
+        self.enabled = enabled
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timers = {}
+            self.started = time.time()
+
+    def enable(self):
+        # Starts from zero so rates in summary() cover only the enabled period
+        if not self.enabled:
+            self.reset()
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                self.timers[name] = [1, seconds, seconds, seconds]  # count, total, max, recent
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+                stats[3] += self.smoothing * (seconds - stats[3])
+
+    def start(self):
+        # Pair with stop(): t = metrics.start(); ...; metrics.stop('stage', t)
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, start):
+        if self.enabled and start:
+            self.observe(name, time.perf_counter() - start)
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def snapshot(self):
+        with self._lock:
+            timers = {
+                name: {'count': c, 'total_s': total, 'mean_ms': total / c * 1000, 'max_ms': mx * 1000, 'recent_ms': recent * 1000}
+                for name, (c, total, mx, recent) in self.timers.items()
+            }
+            return {
+                'time': time.time(),
+                'uptime_s': time.time() - self.started,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'timers': timers,
+            }
+
+    def prometheus_text(self, prefix='objshomar'):
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(snap['gauges'].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        for name, stats in sorted(snap['timers'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            lines.append(f"{prefix}_{name}_seconds_count {stats['count']}")
+            lines.append(f"{prefix}_{name}_seconds_sum {stats['total_s']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Short multi-line text for the on-screen overlay
+        snap = self.snapshot()
+        lines = []
+        uptime = max(snap['uptime_s'], 1e-9)
+        emitted = snap['counters'].get('frames_emitted', 0)
+        lines.append(f"FPS {emitted / uptime:.1f}  " + "  ".join(f"{k} {v}" for k, v in sorted(snap['counters'].items())))
+        if snap['gauges']:
+            lines.append("  ".join(f"{k} {v}" for k, v in sorted(snap['gauges'].items())))
+        if snap['timers']:
+            lines.append("  ".join(f"{k} {s['recent_ms']:.1f}ms" for k, s in sorted(snap['timers'].items())))
+        return "\n".join(lines)
+
+# Shared registry used by the capture/inference/emit stages
+metrics = Metrics()
+
+class MetricsExporter(threading.Thread):
+    # Periodically appends snapshots to a JSONL file and/or serves Prometheus text on
+    # http://host:port/metrics. Enables the registry while running.
+    def __init__(self, registry=metrics, jsonl_path=None, port=None, host='127.0.0.1', interval=5.0):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.jsonl_path = jsonl_path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._server = None
+
+    def run(self):
+        self.registry.enable()
+        if self.port is not None:
+            registry = self.registry
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = registry.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                def log_message(self, *args):
+                    pass
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        while not self._stopped.wait(self.interval):
+            self._write_jsonl()
+        self._write_jsonl()
+
+    def _write_jsonl(self):
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(self.registry.snapshot()) + "\n")
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
@@ -0,0 +1,40 @@
+import os
+import threading
+from collections import OrderedDict
+from yolo.detector import YOLODetector
+
+class ModelCache:
+    # Keeps the most recently used detectors loaded and warmed up, so switching back to one
+    # of them is instant. Keyed by weights, backend and (for exported backends) input size;
+    # other settings are applied to the cached detector with configure().
+    def __init__(self, max_models=2, warmup_batch=1):
+        self.max_models = max(1, int(max_models))
+        self.warmup_batch = warmup_batch
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, model_path, backend='pytorch', imgsz=None):
+        return os.path.abspath(model_path), backend, imgsz if backend != 'pytorch' else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def get(self, model_path, backend='pytorch', **settings):
+        key = self.key(model_path, backend, settings.get('imgsz'))
+        with self._lock:
+            detector = self._models.pop(key, None)
+            if detector is not None:
+                self._models[key] = detector
+        if detector is not None:
+            detector.configure(**settings)
+            return detector
+        detector = YOLODetector(model_path, backend=backend, **settings)
+        if self.warmup_batch:
+            detector.warmup(self.warmup_batch)
+        with self._lock:
+            self._models[key] = detector
+            while len(self._models) > self.max_models:
+                # A detector still used by a running video stays alive until that video ends
+                self._models.popitem(last=False)
+        return detector
@@ -0,0 +1,149 @@
+import threading
+import cv2
+import numpy as np
+from yolo.tracker import box_centers, points_in_polygon
+from yolo.metrics import metrics
+
+class MotionGate:
+    # Decides per frame whether anything changed enough to be worth running the model.
+    # Works on a small grayscale copy: 'diff' compares against the last frame that was
+    # inferred, 'mog2' uses OpenCV's background subtractor. max_skip forces an inference
+    # every so often so slow changes and stale detections cannot persist.
+    def __init__(self, method='diff', width=160, threshold=15, min_changed=0.002, max_skip=30):
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion method: {method}")
+        self.method = method
+        self.width = width
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.max_skip = max_skip
+        self.checked = 0
+        self.skipped = 0
+        self._reference = None
+        self._since_inference = 0
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == 'mog2' else None
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+    def changed_fraction(self, small):
+        if self._subtractor is not None:
+            return np.count_nonzero(self._subtractor.apply(small)) / small.size
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        return np.count_nonzero(cv2.absdiff(small, self._reference) > self.threshold) / small.size
+
+    def needs_inference(self, frame):
+        self.checked += 1
+        small = self._small_gray(frame)
+        moved = self.changed_fraction(small) >= self.min_changed
+        if moved or self._reference is None or self._since_inference >= self.max_skip:
+            self._reference = small
+            self._since_inference = 0
+            return True
+        self._since_inference += 1
+        self.skipped += 1
+        metrics.count('frames_motion_skipped')
+        return False
+
+    def mark_inferred(self, frame):
+        # The model ran on frame without asking the gate: make it the reference, not a decision
+        small = self._small_gray(frame)
+        if self._subtractor is not None:
+            self._subtractor.apply(small)
+        self._reference = small
+        self._since_inference = 0
+
+    def stats(self):
+        return {'checked': self.checked, 'skipped': self.skipped,
+                'skipped_ratio': self.skipped / self.checked if self.checked else 0.0}
+
+class GatedDetector:
+    # Wraps a detector with the same detect/detect_batch API. Only the bounding rectangle of
+    # the region of interest is sent to the model (boxes are mapped back to frame coordinates
+    # and kept only if their center is inside the polygon), and frames without motion reuse
+    # the previous detections instead of running the model.
+    def __init__(self, detector, gate=None, roi=None):
+        self.detector = detector
+        self.gate = gate
+        self._lock = threading.Lock()
+        self._last = None
+        # Settings dict of the wrapped detector _last was made with; configure() replaces it
+        self._last_settings = None
+        self.roi = None
+        self.set_roi(roi)
+
+    def __getattr__(self, name):
+        # names, settings, last_timings, ... come from the wrapped detector
+        return getattr(self.detector, name)
+
+    def set_roi(self, polygon):
+        roi = None if polygon is None or len(polygon) < 3 else np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        with self._lock:
+            self.roi = roi
+            # Cached detections and the motion reference belong to the old region
+            self._last = None
+            if self.gate is not None:
+                self.gate._reference = None
+
+    def set_classes(self, class_names):
+        self.detector.set_classes(class_names)
+        with self._lock:
+            self._last = None
+
+    def _crop(self, frame, roi):
+        if roi is None:
+            return frame, 0, 0
+        h, w = frame.shape[:2]
+        x0, y0 = np.clip(np.floor(roi.min(axis=0)).astype(int), 0, [w - 1, h - 1])
+        x1, y1 = np.clip(np.ceil(roi.max(axis=0)).astype(int), [x0 + 1, y0 + 1], [w, h])
+        return frame[y0:y1, x0:x1], x0, y0
+
+    def _to_frame(self, detections, roi, x0, y0):
+        if roi is None:
+            return detections
+        detections.boxes += np.array([x0, y0, x0, y0], dtype=np.float32)
+        return detections[points_in_polygon(box_centers(detections.boxes), roi)]
+
+    def fingerprint(self):
+        gate = self.gate
+        return dict(self.detector.fingerprint(),
+                    roi=None if self.roi is None else self.roi.tolist(),
+                    gate=None if gate is None else [gate.method, gate.width, gate.threshold, gate.min_changed,
+                                                    gate.max_skip])
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, **overrides):
+        # set_roi/set_classes run on the GUI thread: work on a snapshot and only keep the
+        # result when the region did not change meanwhile
+        settings = self.detector.settings
+        with self._lock:
+            roi = self.roi
+            last = self._last if self._last_settings is settings else None
+        crops = [self._crop(frame, roi) for frame in frames]
+        # Which frames run the model; the others reuse the most recent inferred result. Without
+        # one the first frame always runs and the gate is not asked, so its skip statistics and
+        # reference frame only reflect real decisions.
+        run = []
+        for i, (crop, _, _) in enumerate(crops):
+            if i == 0 and last is None:
+                run.append(True)
+                if self.gate is not None:
+                    self.gate.mark_inferred(crop)
+            else:
+                run.append(self.gate is None or self.gate.needs_inference(crop))
+        inferred = self.detector.detect_batch([crop for (crop, _, _), r in zip(crops, run) if r], **overrides) if any(run) else []
+        results = []
+        it = iter(inferred)
+        for (crop, x0, y0), r in zip(crops, run):
+            if r:
+                last = self._to_frame(next(it), roi, x0, y0)
+            results.append(last[np.arange(len(last))])  # copy, so callers can annotate it
+        with self._lock:
+            if self.roi is roi:
+                self._last, self._last_settings = last, settings
+        return results
@@ -0,0 +1,105 @@
+import threading
+import cv2
+from yolo.capture import open_capture
+from yolo.live import LatestFrameGrabber
+from yolo.counting import filter_detections, count_detections
+from yolo.metrics import metrics
+
+class Stream:
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.cap = None
+        self.grabber = None
+        self.frames = 0
+        self.counts = {}
+
+class MultiStreamManager(threading.Thread):
+    # Runs many camera links against one shared detector.
+    # Each stream gets its own LatestFrameGrabber thread; this thread collects the newest
+    # frame of up to batch_size streams round-robin and runs them through one detect_batch
+    # call. on_result(stream_name, frame_idx, frame, detections, counts) is called per frame.
+    def __init__(self, detector, sources, selected_classes=None, batch_size=8, on_result=None,
+                 capture_options=None):
+        super().__init__(daemon=True)
+        self.detector = detector
+        # Keyword arguments for yolo.capture.open_capture
+        self.capture_options = dict(capture_options or {})
+        if isinstance(sources, dict):
+            self.streams = [Stream(name, url) for name, url in sources.items()]
+        else:
+            self.streams = [Stream(str(i), url) for i, url in enumerate(sources)]
+        self.selected_classes = selected_classes
+        self.batch_size = max(1, int(batch_size))
+        self.on_result = on_result
+        self._ready = threading.Event()
+        self._stopped = False
+        self._next = 0
+
+    def counts(self):
+        # Latest per-stream counts
+        return {s.name: dict(s.counts) for s in self.streams}
+
+    def _open(self):
+        for s in self.streams:
+            s.cap = open_capture(s.url, **self.capture_options)
+            if not self.capture_options.get('buffer_size'):
+                # Keep the decoder's backlog minimal unless the user chose a buffer size
+                s.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            s.grabber = LatestFrameGrabber(s.cap, self._ready)
+            s.grabber.start()
+
+    def _collect(self):
+        # Round-robin over streams so every stream gets a turn even when batch_size is small
+        batch = []
+        n = len(self.streams)
+        last = None
+        for i in range(n):
+            if len(batch) >= self.batch_size:
+                break
+            idx = (self._next + i) % n
+            s = self.streams[idx]
+            ret, frame, _ = s.grabber.take()
+            if ret:
+                batch.append((s, frame))
+                last = idx
+            elif not s.grabber.ended:
+                s.grabber.request()
+        if last is not None:
+            self._next = (last + 1) % n
+        return batch
+
+    def run(self):
+        self._open()
+        try:
+            while not self._stopped:
+                if all(s.grabber.ended for s in self.streams):
+                    break
+                self._ready.clear()
+                batch = self._collect()
+                if not batch:
+                    self._ready.wait(0.1)
+                    continue
+                with metrics.timer('inference'):
+                    detections = self.detector.detect_batch([frame for _, frame in batch])
+                metrics.count('frames_inferred', len(batch))
+                metrics.gauge('batch_size', len(batch))
+                for (s, frame), dets in zip(batch, detections):
+                    if self.selected_classes is not None:
+                        dets = filter_detections(dets, self.selected_classes)
+                    s.counts = count_detections(dets)
+                    if self.on_result is not None:
+                        self.on_result(s.name, s.frames, frame, dets, s.counts)
+                    s.frames += 1
+                    s.grabber.request()
+                    metrics.count('frames_emitted')
+        finally:
+            for s in self.streams:
+                s.grabber.stop()
+            for s in self.streams:
+                s.grabber.join()
+                s.cap.release()
+
+    def stop(self):
+        self._stopped = True
+        self._ready.set()
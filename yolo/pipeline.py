@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+from yolo.metrics import metrics
+
+DROP_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+_END = object()
+
+class FrameQueue:
+    # Bounded queue between two pipeline stages.
+    # 'block' makes the producer wait, 'drop_oldest' evicts the oldest queued item,
+    # 'drop_newest' discards the item being put. Dropped items are counted.
+    def __init__(self, maxsize=4, drop_policy='block', name='queue', drop_metric='frames_dropped'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self._queue = queue.Queue(max(1, int(maxsize)))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.name = name
+        self.drop_metric = drop_metric
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def put(self, item, stop_event):
+        if self.drop_policy == 'drop_newest':
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                metrics.count(self.drop_metric)
+            return
+        if self.drop_policy == 'drop_oldest':
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                        metrics.count(self.drop_metric)
+                    except queue.Empty:
+                        pass
+        self._put_blocking(item, stop_event)
+
+    def close(self, stop_event):
+        # The end marker is never dropped
+        self._put_blocking(_END, stop_event)
+
+    def _put_blocking(self, item, stop_event):
+        while not stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def get_nowait(self):
+        return self._queue.get_nowait()
+
+class FramePipeline:
+    # Capture -> inference -> consumer pipeline connected by bounded queues, so decoding
+    # the next frame overlaps inference on the current one. read_frame is a cap.read-style
+    # callable returning (ret, frame). results() yields (frame_idx, frame, detections) in order.
+    # Batches are collected until batch_size frames are there or max_wait seconds have passed
+    # since the first one, so bursty decoding still fills batches.
+    def __init__(self, read_frame, detector, queue_size=4, drop_policy='block', batch_size=1, cache=None,
+                 start_frame=0, max_wait=0.0):
+        self.read_frame = read_frame
+        # Index of the first frame read_frame returns, when the capture was seeked
+        self.start_frame = start_frame
+        self.detector = detector
+        # Optional yolo.cache.CacheEntry: frames already in it are not sent to the detector
+        self.cache = cache
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.frame_queue = FrameQueue(queue_size, drop_policy, 'frame_queue')
+        self.result_queue = FrameQueue(queue_size, drop_policy, 'result_queue')
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True),
+        ]
+
+    @property
+    def dropped(self):
+        return self.frame_queue.dropped + self.result_queue.dropped
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def stop(self, wait=True):
+        self._stop_event.set()
+        if wait:
+            for t in self._threads:
+                if t.is_alive():
+                    t.join()
+
+    def _capture_loop(self):
+        frame_idx = self.start_frame
+        try:
+            while not self._stop_event.is_set():
+                t = metrics.start()
+                ret, frame = self.read_frame()
+                if not ret:
+                    break
+                metrics.stop('decode', t)
+                metrics.count('frames_read')
+                self.frame_queue.put((frame_idx, frame), self._stop_event)
+                metrics.gauge('frame_queue_depth', self.frame_queue.qsize())
+                frame_idx += 1
+        finally:
+            self.frame_queue.close(self._stop_event)
+
+    def _next_batch(self):
+        # Block for the first frame, then wait up to max_wait for the rest of the batch
+        batch = []
+        while not batch:
+            if self._stop_event.is_set():
+                return None
+            try:
+                item = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return None
+            batch.append(item)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.frame_queue.get(timeout=remaining) if remaining > 0 else self.frame_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                # Put the marker back so the next call ends the loop
+                self.frame_queue.close(self._stop_event)
+                break
+            batch.append(item)
+        return batch
+
+    def _inference_loop(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                frames = [frame for _, frame in batch]
+                with metrics.timer('inference'):
+                    if self.cache is not None:
+                        detections = self.cache.detect_batch(self.detector, [idx for idx, _ in batch], frames)
+                    else:
+                        detections = self.detector.detect_batch(frames)
+                metrics.count('frames_inferred', len(batch))
+                for (frame_idx, frame), dets in zip(batch, detections):
+                    self.result_queue.put((frame_idx, frame, dets), self._stop_event)
+                metrics.gauge('result_queue_depth', self.result_queue.qsize())
+        except Exception as e:
+            self.result_queue._put_blocking(e, self._stop_event)
+        finally:
+            self.result_queue.close(self._stop_event)
+
+    def results(self):
+        while not self._stop_event.is_set():
+            try:
+                item = self.result_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
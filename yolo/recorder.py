@@ -0,0 +1,139 @@
+import collections
+import os
+import queue
+import threading
+import time
+import cv2
+from yolo.pipeline import FrameQueue
+from yolo.metrics import metrics
+
+class VideoRecorder(threading.Thread):
+    # Encodes frames to a video file on its own thread. write() only enqueues, so the
+    # detection loop never waits for the encoder; with 'drop_oldest' or 'drop_newest' a slow
+    # encoder loses frames instead (counted in `dropped`), with 'block' nothing is lost.
+    # The writer is created from the size of the first frame.
+    def __init__(self, path, fps=25, fourcc='mp4v', queue_size=64, drop_policy='drop_oldest'):
+        super().__init__(daemon=True)
+        self.path = path
+        self.fps = fps or 25
+        self.fourcc = fourcc
+        self.frames = 0
+        self.error = None
+        self._queue = FrameQueue(queue_size, drop_policy, 'record_queue', drop_metric='record_dropped')
+        self._stop_event = threading.Event()
+        self._closed = threading.Event()
+        self.start()
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def write(self, frame):
+        if not self._closed.is_set():
+            self._queue.put(frame, self._stop_event)
+
+    def close(self, wait=True):
+        # Queued frames are still written before the file is finalized. Never waits for room
+        # in the queue; with wait=False the caller can join() later.
+        self._closed.set()
+        if wait:
+            self.join()
+
+    def run(self):
+        writer = None
+        try:
+            while True:
+                try:
+                    frame = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._closed.is_set():
+                        break
+                    continue
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+                    if not writer.isOpened():
+                        raise IOError(f"Could not open video writer: {self.path}")
+                with metrics.timer('encode'):
+                    writer.write(frame)
+                self.frames += 1
+        except Exception as e:
+            self.error = e
+            # Producers using 'block' return from write() instead of waiting for this thread
+            self._stop_event.set()
+        finally:
+            if writer is not None:
+                writer.release()
+
+class EventClipRecorder:
+    # Writes short clips around count events: the last pre_seconds of frames are kept in
+    # memory, and an event starts a clip with them that runs until post_seconds after the
+    # last event. Each clip is encoded by its own VideoRecorder thread, whose queue holds a
+    # whole clip. drop_policy applies when encoding still falls a full clip behind: 'block'
+    # keeps every frame (offline runs), a dropping policy never slows the caller (live GUI).
+    def __init__(self, directory, fps=25, pre_seconds=2.0, post_seconds=3.0, fourcc='mp4v', prefix='clip',
+                 drop_policy='block'):
+        self.directory = directory
+        self.fps = fps or 25
+        self.post_frames = max(1, int(post_seconds * self.fps))
+        self.fourcc = fourcc
+        self.prefix = prefix
+        self.drop_policy = drop_policy
+        self.clips = []
+        self._recorders = []
+        self._pre_roll = collections.deque(maxlen=max(1, int(pre_seconds * self.fps)))
+        self._recorder = None
+        self._remaining = 0
+        self._dropped = 0
+
+    @property
+    def dropped(self):
+        return self._dropped + sum(r.dropped for r in self._recorders)
+
+    def _prune(self):
+        # Forget finished clip writers, keeping their drop counts
+        self._dropped += sum(r.dropped for r in self._recorders if not r.is_alive())
+        self._recorders = [r for r in self._recorders if r.is_alive()]
+
+    def add(self, frame_idx, frame, event=False):
+        if event:
+            if self._recorder is None:
+                name = f"{self.prefix}_{frame_idx:08d}_{time.strftime('%Y%m%d_%H%M%S')}.mp4"
+                path = os.path.join(self.directory, name)
+                self._recorder = VideoRecorder(path, self.fps, self.fourcc,
+                                               queue_size=len(self._pre_roll) + self.post_frames,
+                                               drop_policy=self.drop_policy)
+                self._recorders.append(self._recorder)
+                self.clips.append(path)
+                for pre_frame in self._pre_roll:
+                    self._recorder.write(pre_frame)
+            self._remaining = self.post_frames
+        if self._recorder is not None:
+            self._recorder.write(frame)
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._recorder.close(wait=False)
+                self._recorder = None
+                self._prune()
+            self._pre_roll.clear()
+        else:
+            self._pre_roll.append(frame)
+
+    def close(self, wait=True):
+        # Finishes the open clip without blocking; with wait, also waits until every clip has
+        # been written (otherwise join() later)
+        self._pre_roll.clear()
+        if self._recorder is not None:
+            self._recorder.close(wait=False)
+            self._recorder = None
+        if wait:
+            self.join()
+
+    def join(self):
+        for recorder in self._recorders:
+            recorder.join()
+        self._prune()
+
+    def is_alive(self):
+        return any(r.is_alive() for r in self._recorders)
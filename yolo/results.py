@@ -0,0 +1,83 @@
+import numpy as np
+
+class Detections:
+    # Columnar detection results for one frame: boxes (N, 4) xyxy, conf (N,), class_id (N,).
+    # names maps class IDs to class names (the model's names dict). Iterating yields the old
+    # per-box dicts for code that still wants them.
+    __slots__ = ('boxes', 'conf', 'class_id', 'names', 'track_id')
+
+    def __init__(self, boxes=None, conf=None, class_id=None, names=None, track_id=None):
+        self.boxes = np.zeros((0, 4), dtype=np.float32) if boxes is None else np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.zeros(len(self.boxes), dtype=np.float32) if conf is None else np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.class_id = np.zeros(len(self.boxes), dtype=np.int64) if class_id is None else np.asarray(class_id, dtype=np.int64).reshape(-1)
+        self.names = names if names is not None else {}
+        self.track_id = None if track_id is None else np.asarray(track_id, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def from_dicts(cls, detections, names=None):
+        names = dict(names or {})
+        for det in detections:
+            names.setdefault(det['class_id'], det['class_name'])
+        return cls(
+            boxes=np.array([det['box'] for det in detections], dtype=np.float32).reshape(-1, 4),
+            conf=np.array([det['conf'] for det in detections], dtype=np.float32),
+            class_id=np.array([det['class_id'] for det in detections], dtype=np.int64),
+            names=names)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, index):
+        # Select detections with a boolean mask, index array or slice
+        return Detections(self.boxes[index], self.conf[index], self.class_id[index], self.names,
+                          None if self.track_id is None else self.track_id[index])
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def class_name(self, class_id):
+        return self.names.get(int(class_id), str(class_id))
+
+    def class_ids_for(self, class_names):
+        return [i for i, name in self.names.items() if name in class_names]
+
+    def mask_classes(self, class_ids):
+        return np.isin(self.class_id, np.asarray(list(class_ids), dtype=np.int64))
+
+    def filter_classes(self, class_ids):
+        return self[self.mask_classes(class_ids)]
+
+    def filter_names(self, class_names):
+        return self.filter_classes(self.class_ids_for(class_names))
+
+    def counts(self):
+        # {class_name: count} for every class present
+        if len(self) == 0:
+            return {}
+        bins = np.bincount(self.class_id)
+        return {self.class_name(i): int(bins[i]) for i in np.flatnonzero(bins)}
+
+    def to_dicts(self):
+        detections = []
+        for i in range(len(self)):
+            det = {
+                'box': self.boxes[i],  # [x1, y1, x2, y2]
+                'conf': float(self.conf[i]),
+                'class_id': int(self.class_id[i]),
+                'class_name': self.class_name(self.class_id[i]),
+            }
+            if self.track_id is not None:
+                det['track_id'] = int(self.track_id[i])
+            detections.append(det)
+        return detections
+
+    @staticmethod
+    def concatenate(parts, names=None):
+        parts = list(parts)
+        if not parts:
+            return Detections(names=names)
+        track_ids = None
+        if all(p.track_id is not None for p in parts):
+            track_ids = np.concatenate([p.track_id for p in parts])
+        return Detections(np.concatenate([p.boxes for p in parts]), np.concatenate([p.conf for p in parts]),
+                          np.concatenate([p.class_id for p in parts]), names or parts[0].names, track_ids)
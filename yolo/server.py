@@ -0,0 +1,281 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+import urllib.parse
+import cv2
+from yolo.metrics import metrics
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MJPEG_BOUNDARY = "objshomarframe"
+
+class _Channel:
+    # Latest state of one stream. Subscribers always take the newest version, so a slow
+    # client skips frames instead of queueing them; the JPEG of a version is encoded once
+    # and shared by every MJPEG client.
+    def __init__(self):
+        self.version = 0
+        self.message = None
+        self.frame = None
+        self.frame_version = 0
+        self.jpeg = None
+        self.jpeg_version = 0
+        self.encode_lock = asyncio.Lock()
+        self.updated = asyncio.Event()
+
+class LiveServer(threading.Thread):
+    # Local asyncio HTTP server on its own thread publishing live counts and annotated frames:
+    #   GET /counts                 latest counts of every stream as JSON
+    #   GET /events                 counts as Server-Sent Events
+    #   GET /ws                     counts over a WebSocket
+    #   GET /streams/<name>/mjpeg   annotated frames as MJPEG (multipart/x-mixed-replace)
+    #   GET /streams/<name>/frame.jpg  the latest annotated frame
+    # /events and /ws take ?stream=<name> to follow a single stream that has already published
+    # (404 otherwise). publish() is called from the detection threads and only hands references
+    # to the event loop; JPEG encoding runs in the loop's executor and only when a client wants
+    # frames.
+    def __init__(self, host='127.0.0.1', port=8765, jpeg_quality=80):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.jpeg_quality = jpeg_quality
+        self.loop = None
+        self._channels = {}
+        self._any_update = None
+        self._server = None
+        self._clients = 0
+        self._ready = threading.Event()
+        self.error = None
+        self.start()
+        self._ready.wait()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._start())
+        except OSError as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    async def _start(self):
+        self._any_update = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Actual port when started with port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def publish(self, stream, frame_idx, counts, totals=None, frame=None):
+        if self.error is not None or self.loop is None or self.loop.is_closed():
+            return
+        message = {'stream': stream, 'frame': frame_idx, 'time': round(time.time(), 3), 'counts': counts}
+        if totals is not None:
+            message['totals'] = totals
+        try:
+            self.loop.call_soon_threadsafe(self._update, stream, message, frame)
+        except RuntimeError:
+            pass  # loop stopped
+
+    def _update(self, stream, message, frame):
+        channel = self._channels.get(stream)
+        if channel is None:
+            channel = self._channels[stream] = _Channel()
+        channel.version += 1
+        channel.message = json.dumps(message)
+        if frame is not None:
+            channel.frame = frame
+            channel.frame_version = channel.version
+        event, channel.updated = channel.updated, asyncio.Event()
+        event.set()
+        event, self._any_update = self._any_update, asyncio.Event()
+        event.set()
+
+    async def _jpeg(self, channel):
+        # None when the frame could not be encoded
+        async with channel.encode_lock:
+            if channel.jpeg_version != channel.frame_version:
+                frame, version = channel.frame, channel.frame_version
+                params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+                t = metrics.start()
+                try:
+                    ok, data = await self.loop.run_in_executor(None, cv2.imencode, '.jpg', frame, params)
+                except cv2.error:
+                    ok = False
+                metrics.stop('jpeg_encode', t)
+                channel.jpeg, channel.jpeg_version = (data.tobytes() if ok else None), version
+            return channel.jpeg
+
+    async def _handle(self, reader, writer):
+        self._clients += 1
+        metrics.gauge('server_clients', self._clients)
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode('latin-1').split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    key, value = line.split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+            url = urllib.parse.urlsplit(target)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            parts = [urllib.parse.unquote(p) for p in url.path.strip('/').split('/')]
+            if method != 'GET':
+                await self._respond(writer, 405, b"Method Not Allowed", 'text/plain')
+            elif parts == ['counts']:
+                body = "{" + ", ".join(f"{json.dumps(name)}: {c.message}" for name, c in self._channels.items()
+                                       if c.message is not None) + "}"
+                await self._respond(writer, 200, body.encode(), 'application/json')
+            elif query.get('stream') is not None and query['stream'] not in self._channels:
+                # Only streams that have published can be followed
+                await self._respond(writer, 404, b"Not Found", 'text/plain')
+            elif parts == ['events']:
+                await self._serve_events(writer, query.get('stream'))
+            elif parts == ['ws'] and headers.get('upgrade', '').lower() == 'websocket':
+                await self._serve_websocket(reader, writer, headers, query.get('stream'))
+            elif len(parts) == 3 and parts[0] == 'streams' and parts[1] in self._channels:
+                channel = self._channels[parts[1]]
+                if parts[2] == 'mjpeg':
+                    await self._serve_mjpeg(writer, channel)
+                elif parts[2] == 'frame.jpg' and channel.frame is not None:
+                    jpeg = await self._jpeg(channel)
+                    if jpeg is None:
+                        await self._respond(writer, 404, b"Not Found", 'text/plain')
+                    else:
+                        await self._respond(writer, 200, jpeg, 'image/jpeg')
+                else:
+                    await self._respond(writer, 404, b"Not Found", 'text/plain')
+            else:
+                await self._respond(writer, 404, b"Not Found", 'text/plain')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # server stopping
+        finally:
+            self._clients -= 1
+            metrics.gauge('server_clients', self._clients)
+            writer.close()
+
+    def _head(self, status, content_type, extra=()):
+        reason = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed'}.get(status, '')
+        lines = [f"HTTP/1.1 {status} {reason}", f"Content-Type: {content_type}",
+                 "Access-Control-Allow-Origin: *", "Cache-Control: no-cache"] + list(extra)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+    async def _respond(self, writer, status, body, content_type):
+        writer.write(self._head(status, content_type, [f"Content-Length: {len(body)}", "Connection: close"]) + body)
+        await writer.drain()
+
+    async def _updates(self, stream=None):
+        # Yields (name, channel) for streams with a newer version than last yielded,
+        # newest state only
+        seen = {}
+        while True:
+            event = self._any_update if stream is None else self._channels[stream].updated
+            changed = [(name, c) for name, c in self._channels.items()
+                       if (stream is None or name == stream) and c.version != seen.get(name)]
+            if not changed:
+                await event.wait()
+                continue
+            for name, channel in changed:
+                seen[name] = channel.version
+                yield name, channel
+
+    async def _serve_events(self, writer, stream):
+        writer.write(self._head(200, 'text/event-stream'))
+        async for _, channel in self._updates(stream):
+            if channel.message is not None:
+                writer.write(f"data: {channel.message}\n\n".encode())
+                await writer.drain()
+
+    async def _serve_websocket(self, reader, writer, headers, stream):
+        key = headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+
+        async def send():
+            async for _, channel in self._updates(stream):
+                if channel.message is not None:
+                    writer.write(ws_frame(channel.message.encode()))
+                    await writer.drain()
+
+        sender = asyncio.ensure_future(send())
+        try:
+            # Read client frames only to answer pings and notice the close
+            while True:
+                opcode, payload = await ws_read(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    await writer.drain()
+                    break
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+
+    async def _serve_mjpeg(self, writer, channel):
+        writer.write(self._head(200, f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"))
+        sent = 0
+        while True:
+            if channel.frame_version == sent:
+                await channel.updated.wait()
+                continue
+            if sent:
+                metrics.count('server_frames_dropped', max(0, channel.frame_version - sent - 1))
+            sent = channel.frame_version
+            jpeg = await self._jpeg(channel)
+            if jpeg is None:
+                continue
+            writer.write(f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n"
+                         .encode() + jpeg + b"\r\n")
+            # Frames published while this client drains are skipped, not queued
+            await writer.drain()
+
+    def stop(self):
+        if self.loop is None or self.loop.is_closed() or self.error is not None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self.join()
+
+def ws_frame(payload, opcode=0x1):
+    # Unmasked server frame
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+async def ws_read(reader):
+    # (opcode, payload) of the next client frame; client frames are always masked
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+    payload = await reader.readexactly(length)
+    return first & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from yolo.pipeline import FramePipeline
+from yolo.counting import filter_detections, count_detections
+from yolo.checkpoint import seek_capture
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+def split_ranges(total_frames, segments):
+    # Split [0, total_frames) into up to `segments` contiguous (start, end) ranges
+    segments = max(1, min(int(segments), total_frames))
+    size, extra = divmod(total_frames, segments)
+    ranges = []
+    start = 0
+    for i in range(segments):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+def seeks_exactly(cap, frames):
+    # True when setting CAP_PROP_POS_FRAMES lands exactly on each of `frames`
+    for frame_idx in frames:
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx) or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_idx:
+            return False
+    return True
+
+def _init_worker(model_path, backend, threads_per_worker, settings):
+    from yolo.detector import YOLODetector
+    if threads_per_worker:
+        # Keep workers from oversubscribing the CPU with their own thread pools
+        cv2.setNumThreads(threads_per_worker)
+        try:
+            import torch
+            torch.set_num_threads(threads_per_worker)
+        except ImportError:
+            pass
+    _worker['detector'] = YOLODetector(model_path, backend=backend, **settings)
+
+def _count_segment(video_path, start, end, selected_classes, batch_size, batch_wait=0.0):
+    # Counts frames [start, end); end None reads to the end of the video
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    try:
+        seek_capture(cap, start)
+    except IOError:
+        cap.release()
+        raise
+    remaining = [float('inf') if end is None else end - start]
+    def read_frame():
+        if remaining[0] <= 0:
+            return False, None
+        remaining[0] -= 1
+        return cap.read()
+    pipeline = FramePipeline(read_frame, _worker['detector'], queue_size=batch_size * 2, batch_size=batch_size,
+                             max_wait=batch_wait)
+    pipeline.start()
+    rows = []
+    try:
+        for offset, _, detections in pipeline.results():
+            rows.append((start + offset, count_detections(filter_detections(detections, selected_classes))))
+    finally:
+        pipeline.stop()
+        cap.release()
+    if end is not None and len(rows) < end - start:
+        # The next segment starts at `end`, so these frames would be missing from the output
+        raise IOError(f"Frames {start}-{end} of {video_path}: video ended after {len(rows)} frames")
+    return rows
+
+def count_video_sharded(video_path, model_path, selected_classes, workers=None, segments_per_worker=2, batch_size=8,
+                        settings=None, backend='pytorch', batch_wait=0.0):
+    # Splits a video file into frame ranges, counts each range in a worker process with its
+    # own detector, and yields (frame_idx, counts) for every frame in order. The frame count
+    # reported by the container is only an estimate: the last segment reads to the end of the
+    # video, and an earlier segment that ends early raises IOError instead of leaving a gap.
+    # When the container cannot seek exactly, every segment would have to decode from frame 0
+    # to reach its start, so the whole video is counted as a single segment instead.
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames <= 0:
+        cap.release()
+        raise IOError(f"Could not determine the frame count of {video_path}")
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(total_frames, workers * segments_per_worker)
+    if len(ranges) > 1 and not seeks_exactly(cap, [start for start, _ in ranges[1:]]):
+        ranges = [(0, total_frames)]
+        workers = 1
+    cap.release()
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    selected_classes = set(selected_classes)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, backend, threads_per_worker, settings or {})) as pool:
+        futures = [pool.submit(_count_segment, video_path, start, end if i < len(ranges) - 1 else None,
+                               selected_classes, batch_size, batch_wait)
+                   for i, (start, end) in enumerate(ranges)]
+        # Futures are consumed in submission order, so rows come out ordered by frame
+        for future in futures:
+            for row in future.result():
+                yield row
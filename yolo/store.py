@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+import time
+from yolo.metrics import metrics
+
+# Rollup tables and their bucket size in seconds, finest first
+RESOLUTIONS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+class CountStore(threading.Thread):
+    # Time-series store of counts per source and class in SQLite. Each row aggregates one
+    # bucket: sum and max of the per-frame values and the number of frames. kind 'count' holds
+    # the objects visible per frame; the tracking totals ('unique', '<line> in', zone names)
+    # are stored as per-frame increments, so their sum is the number of new objects.
+    # add() only updates an in-memory per-second aggregate; this thread flushes it every
+    # `interval` seconds with one upsert per table, keeping the minute and hour rollups
+    # current so range queries never scan the per-second rows.
+    def __init__(self, path, interval=2.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self._pending = {}
+        self._last_totals = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        db = self._connect()
+        for table in RESOLUTIONS:
+            db.execute(f"CREATE TABLE IF NOT EXISTS counts_{table} ("
+                       "source TEXT, kind TEXT, class TEXT, bucket INTEGER, "
+                       "total INTEGER, peak INTEGER, frames INTEGER, "
+                       "PRIMARY KEY (source, kind, class, bucket)) WITHOUT ROWID")
+            # For queries across all sources
+            db.execute(f"CREATE INDEX IF NOT EXISTS counts_{table}_kind ON counts_{table} (kind, class, bucket)")
+        db.commit()
+        db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def add(self, source, timestamp, counts, totals=None):
+        second = int(timestamp)
+        # kind 'frames' counts the frames seen, so averages include frames where a class was absent
+        values = [('frames', '', 1)] + [('count', name, value) for name, value in counts.items()]
+        with self._lock:
+            if totals is not None:
+                last = self._last_totals.get(source, {})
+                for kind, by_class in totals.items():
+                    for name, value in by_class.items():
+                        values.append((kind, name, value - last.get(kind, {}).get(name, 0)))
+                self._last_totals[source] = totals
+            for kind, name, value in values:
+                key = (source, kind, name, second)
+                total, peak, frames = self._pending.get(key, (0, 0, 0))
+                self._pending[key] = (total + value, max(peak, value), frames + 1)
+
+    def reset_totals(self, source, totals=None):
+        # Baseline for the next increments of a source: None when its tracking totals start
+        # over (new counter), or the restored totals when resuming from a checkpoint
+        with self._lock:
+            if totals is None:
+                self._last_totals.pop(source, None)
+            else:
+                self._last_totals[source] = totals
+
+    def run(self):
+        db = self._connect()
+        try:
+            while not self._stopped.wait(self.interval):
+                self._flush(db)
+            self._flush(db)
+        finally:
+            db.close()
+
+    def _flush(self, db):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        with metrics.timer('store_flush'):
+            with db:
+                for table, size in RESOLUTIONS.items():
+                    rows = {}
+                    for (source, kind, name, second), (total, peak, frames) in pending.items():
+                        key = (source, kind, name, second - second % size)
+                        t, p, f = rows.get(key, (0, 0, 0))
+                        rows[key] = (t + total, max(p, peak), f + frames)
+                    db.executemany(
+                        f"INSERT INTO counts_{table} (source, kind, class, bucket, total, peak, frames) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source, kind, class, bucket) DO UPDATE SET "
+                        "total = total + excluded.total, peak = max(peak, excluded.peak), "
+                        "frames = frames + excluded.frames",
+                        [key + value for key, value in rows.items()])
+        metrics.count('store_rows', len(pending))
+
+    def stop(self):
+        # Flushes what is pending and waits for the writer
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+
+class CheckpointedCounts:
+    # Holds add() calls for a CountStore until commit(), which is called whenever a checkpoint
+    # is saved. A run resumed from a checkpoint then does not add the frames it processes again
+    # a second time; frames after the last checkpoint only reach the store once.
+    def __init__(self, store):
+        self.store = store
+        self._pending = []
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def add(self, source, timestamp, counts, totals=None):
+        self._pending.append((source, timestamp, counts, totals))
+
+    def commit(self):
+        for row in self._pending:
+            self.store.add(*row)
+        self._pending = []
+
+def query_counts(path, source=None, kind='count', class_name=None, start=None, end=None, resolution='hour'):
+    # Rows (source, class, bucket, total, peak, frames) from the rollup of the given resolution,
+    # for buckets starting in [start, end). Only an index range is read: the primary key when
+    # a source is given, otherwise the (kind, class, bucket) index, which covers every row
+    # of the kind when no class is given either.
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    where, args = ["kind = ?"], [kind]
+    for column, value in (('source', source), ('class', class_name)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            args.append(value)
+    if start is not None:
+        # Include the bucket that start falls in
+        where.append("bucket >= ?")
+        args.append(int(start) - int(start) % RESOLUTIONS[resolution])
+    if end is not None:
+        where.append("bucket < ?")
+        args.append(int(end))
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        return db.execute(f"SELECT source, class, bucket, total, peak, frames FROM counts_{resolution} "
+                          f"WHERE {' AND '.join(where)} ORDER BY source, class, bucket", args).fetchall()
+    finally:
+        db.close()
+
+def parse_since(value, now=None):
+    # "90s", "15m", "6h", "7d" -> epoch seconds that long before now
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    now = time.time() if now is None else now
+    if value[-1:] in units:
+        return now - float(value[:-1]) * units[value[-1]]
+    return now - float(value)
@@ -0,0 +1,95 @@
+import numpy as np
+from yolo.results import Detections
+from yolo.tracker import iou_matrix
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    # (N, 4) x0, y0, x1, y1 tiles covering the frame, neighbours overlapping by about `overlap`;
+    # the last row/column is shifted back so every tile has the full size
+    def starts(length):
+        if length <= tile_size:
+            return np.zeros(1, dtype=np.int64)
+        stride = max(int(tile_size * (1 - overlap)), 1)
+        n = int(np.ceil((length - tile_size) / stride)) + 1
+        return np.minimum(np.arange(n) * stride, length - tile_size)
+    xs, ys = starts(width), starts(height)
+    x0, y0 = np.meshgrid(xs, ys)
+    x0, y0 = x0.ravel(), y0.ravel()
+    return np.stack([x0, y0, np.minimum(x0 + tile_size, width), np.minimum(y0 + tile_size, height)], axis=1)
+
+def ios_matrix(a, b):
+    # Intersection over the smaller box: a box cut at a tile edge is mostly inside the whole one
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    iou = iou_matrix(a, b)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    # inter = iou * union, union = area_a + area_b - inter
+    inter = iou * (area_a[:, None] + area_b[None, :]) / (1 + iou)
+    return inter / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-9)
+
+def nms(boxes, scores, class_ids, threshold=0.5, metric='iou'):
+    # Class-aware greedy NMS. The overlap matrix is computed once; each step suppresses every
+    # lower-scored box overlapping the current keeper in one vectorized row operation.
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-scores, kind='stable')
+    boxes, class_ids = boxes[order], class_ids[order]
+    overlap = (ios_matrix if metric == 'ios' else iou_matrix)(boxes, boxes)
+    overlap[class_ids[:, None] != class_ids[None, :]] = 0
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        suppressed[i + 1:] |= overlap[i, i + 1:] > threshold
+    return order[~suppressed]
+
+class TiledDetector:
+    # Sliced inference for frames much larger than the network input: each frame is cut into
+    # overlapping tiles (plus, by default, the whole frame for large objects), all tiles of all
+    # frames go to the wrapped detector in one detect_batch call, and the boxes are shifted back
+    # to frame coordinates and merged across tiles with NMS.
+    def __init__(self, detector, tile_size=640, overlap=0.2, merge_threshold=0.5, metric='ios', full_frame=True):
+        self.detector = detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.merge_threshold = merge_threshold
+        self.metric = metric
+        self.full_frame = full_frame
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def tiles_for(self, frame):
+        h, w = frame.shape[:2]
+        tiles = tile_grid(w, h, self.tile_size, self.overlap)
+        if len(tiles) > 1 and self.full_frame:
+            tiles = np.vstack([[[0, 0, w, h]], tiles])
+        return tiles
+
+    def fingerprint(self):
+        return dict(self.detector.fingerprint(), tiling=[self.tile_size, self.overlap, self.merge_threshold,
+                                                         self.metric, self.full_frame])
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, **overrides):
+        if len(frames) == 0:
+            return []
+        grids = [self.tiles_for(frame) for frame in frames]
+        crops = [frame[y0:y1, x0:x1] for frame, tiles in zip(frames, grids) for x0, y0, x1, y1 in tiles]
+        detections = iter(self.detector.detect_batch(crops, **overrides))
+        results = []
+        for tiles in grids:
+            parts = []
+            for tile in tiles:
+                d = next(detections)
+                d.boxes = d.boxes + np.array([tile[0], tile[1], tile[0], tile[1]], dtype=d.boxes.dtype)
+                parts.append(d)
+            merged = Detections.concatenate(parts)
+            if len(tiles) > 1:
+                keep = nms(merged.boxes, merged.conf, merged.class_id, self.merge_threshold, self.metric)
+                max_det = getattr(self.detector, 'settings', {}).get('max_det')
+                merged = merged[keep[:max_det] if max_det else keep]
+            results.append(merged)
+        return results
@@ -0,0 +1,263 @@
+import numpy as np
+
+def iou_matrix(a, b):
+    # Pairwise IoU between (N, 4) and (M, 4) xyxy boxes
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def match(scores, threshold):
+    # Greedy one-to-one matching on a score matrix. Each round accepts every pair that is
+    # the best choice of both its row and its column, so the whole step is a handful of
+    # vectorized argmax passes instead of a loop over pairs.
+    scores = np.where(scores >= threshold, scores, 0).astype(np.float32)
+    rows, cols = [], []
+    while scores.size and scores.max() > 0:
+        best_col = scores.argmax(axis=1)
+        best_row = scores.argmax(axis=0)
+        r = np.arange(scores.shape[0])
+        mutual = (best_row[best_col] == r) & (scores[r, best_col] > 0)
+        mr, mc = r[mutual], best_col[mutual]
+        rows.append(mr)
+        cols.append(mc)
+        scores[mr, :] = 0
+        scores[:, mc] = 0
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+def box_centers(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+class Tracker:
+    # IoU tracker with a constant-velocity (alpha-beta) motion model. All track state is
+    # kept in arrays so predict, associate and update are vectorized over every track.
+    def __init__(self, iou_threshold=0.3, max_age=30, alpha=0.6, beta=0.2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.alpha = alpha
+        self.beta = beta
+        self.next_id = 1
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.class_ids = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=np.int64)
+
+    def update(self, boxes, class_ids):
+        # Returns (track_ids, prev_centers, centers) aligned with the input boxes. Centers are
+        # the filtered track positions before and after this frame; prev_centers is NaN for
+        # tracks that start on this frame.
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        n = len(boxes)
+        prev_centers = box_centers(self.boxes)
+        predicted = self.boxes + self.velocity
+        scores = iou_matrix(predicted, boxes)
+        scores[self.class_ids[:, None] != class_ids[None, :]] = 0
+        tr, dt = match(scores, self.iou_threshold)
+
+        track_ids = np.full(n, -1, dtype=np.int64)
+        det_prev = np.full((n, 2), np.nan, dtype=np.float32)
+        residual = boxes[dt] - predicted[tr]
+        self.boxes = predicted
+        self.boxes[tr] += self.alpha * residual
+        self.velocity[tr] += self.beta * residual
+        self.age += 1
+        self.age[tr] = 0
+        track_ids[dt] = self.ids[tr]
+        det_prev[dt] = prev_centers[tr]
+        det_centers = box_centers(boxes)
+        det_centers[dt] = box_centers(self.boxes[tr])
+
+        # Unmatched detections start new tracks
+        new = np.setdiff1d(np.arange(n), dt)
+        new_ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int64)
+        self.next_id += len(new)
+        track_ids[new] = new_ids
+        self.boxes = np.concatenate([self.boxes, boxes[new]])
+        self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4), dtype=np.float32)])
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.class_ids = np.concatenate([self.class_ids, class_ids[new]])
+        self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+
+        # Forget tracks that have not been seen for max_age frames
+        keep = self.age <= self.max_age
+        if not keep.all():
+            self.boxes = self.boxes[keep]
+            self.velocity = self.velocity[keep]
+            self.ids = self.ids[keep]
+            self.class_ids = self.class_ids[keep]
+            self.age = self.age[keep]
+        return track_ids, det_prev, det_centers
+
+    def state_dict(self):
+        return {'next_id': self.next_id, 'boxes': self.boxes.tolist(), 'velocity': self.velocity.tolist(),
+                'ids': self.ids.tolist(), 'class_ids': self.class_ids.tolist(), 'age': self.age.tolist()}
+
+    def load_state_dict(self, state):
+        self.next_id = state['next_id']
+        self.boxes = np.asarray(state['boxes'], dtype=np.float32).reshape(-1, 4)
+        self.velocity = np.asarray(state['velocity'], dtype=np.float32).reshape(-1, 4)
+        self.ids = np.asarray(state['ids'], dtype=np.int64)
+        self.class_ids = np.asarray(state['class_ids'], dtype=np.int64)
+        self.age = np.asarray(state['age'], dtype=np.int64)
+
+def _side(points, p1, p2):
+    # Which side of the line p1->p2 each point is on (+1 or -1, points on the line count as +1)
+    cross = (p2[0] - p1[0]) * (points[:, 1] - p1[1]) - (p2[1] - p1[1]) * (points[:, 0] - p1[0])
+    return np.where(cross >= 0, 1, -1)
+
+def points_in_polygon(points, polygon):
+    # Vectorized ray casting over points; loops only over the polygon's edges
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+    x, y = points[:, 0], points[:, 1]
+    inside = np.zeros(len(points), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < x_at)
+    return inside
+
+class LineCounter:
+    # Counts tracked objects whose center crosses the segment p1-p2, once per ID and direction.
+    # 'in' is crossing from the right of p1->p2 to its left (in image coordinates).
+    def __init__(self, name, p1, p2):
+        self.name = name
+        self.p1 = np.asarray(p1, dtype=np.float32)
+        self.p2 = np.asarray(p2, dtype=np.float32)
+        self.totals = {'in': {}, 'out': {}}
+        self._counted = set()
+
+    def update(self, track_ids, prev_centers, centers, class_ids, names):
+        valid = ~np.isnan(prev_centers[:, 0])
+        s0 = _side(prev_centers, self.p1, self.p2)
+        s1 = _side(centers, self.p1, self.p2)
+        # The movement has to cross the line and pass between its end points
+        a = (self.p1[0] - prev_centers[:, 0]) * (centers[:, 1] - prev_centers[:, 1]) - (self.p1[1] - prev_centers[:, 1]) * (centers[:, 0] - prev_centers[:, 0])
+        b = (self.p2[0] - prev_centers[:, 0]) * (centers[:, 1] - prev_centers[:, 1]) - (self.p2[1] - prev_centers[:, 1]) * (centers[:, 0] - prev_centers[:, 0])
+        crossed = valid & (s0 * s1 < 0) & (np.sign(a) * np.sign(b) <= 0)
+        for i in np.flatnonzero(crossed):
+            direction = 'in' if s0[i] > 0 else 'out'
+            key = (int(track_ids[i]), direction)
+            if key in self._counted:
+                continue
+            self._counted.add(key)
+            bucket = self.totals[direction]
+            cname = names.get(int(class_ids[i]), str(class_ids[i]))
+            bucket[cname] = bucket.get(cname, 0) + 1
+
+    def prune(self, active_ids):
+        # Track IDs are never reused, so IDs the tracker has dropped cannot be counted again
+        self._counted = {key for key in self._counted if key[0] in active_ids}
+
+    def state_dict(self):
+        return {'totals': self.totals, 'counted': sorted(self._counted)}
+
+    def load_state_dict(self, state):
+        self.totals = {direction: dict(bucket) for direction, bucket in state['totals'].items()}
+        self._counted = {(track_id, direction) for track_id, direction in state['counted']}
+
+class ZoneCounter:
+    # Counts tracked objects whose center enters the polygon, once per ID
+    def __init__(self, name, polygon):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.totals = {}
+        self._counted = set()
+
+    def update(self, track_ids, prev_centers, centers, class_ids, names):
+        valid = ~np.isnan(prev_centers[:, 0])
+        entered = valid & ~points_in_polygon(prev_centers, self.polygon) & points_in_polygon(centers, self.polygon)
+        for i in np.flatnonzero(entered):
+            track_id = int(track_ids[i])
+            if track_id in self._counted:
+                continue
+            self._counted.add(track_id)
+            cname = names.get(int(class_ids[i]), str(class_ids[i]))
+            self.totals[cname] = self.totals.get(cname, 0) + 1
+
+    def prune(self, active_ids):
+        self._counted &= active_ids
+
+    def state_dict(self):
+        return {'totals': self.totals, 'counted': sorted(self._counted)}
+
+    def load_state_dict(self, state):
+        self.totals = dict(state['totals'])
+        self._counted = set(state['counted'])
+
+class TrackingCounter:
+    # Tracks detections across frames and keeps cumulative counts: unique objects seen per
+    # class, plus totals for every counting line and zone.
+    def __init__(self, lines=(), zones=(), **tracker_kwargs):
+        self.tracker = Tracker(**tracker_kwargs)
+        self.lines = list(lines)
+        self.zones = list(zones)
+        self.unique = {}
+
+    def update(self, detections):
+        # Sets detections.track_id and returns totals()
+        track_ids, prev_centers, centers = self.tracker.update(detections.boxes, detections.class_id)
+        detections.track_id = track_ids
+        new = np.isnan(prev_centers[:, 0])
+        if new.any():
+            bins = np.bincount(detections.class_id[new])
+            for class_id in np.flatnonzero(bins):
+                cname = detections.class_name(class_id)
+                self.unique[cname] = self.unique.get(cname, 0) + int(bins[class_id])
+        regions = self.lines + self.zones
+        for region in regions:
+            region.update(track_ids, prev_centers, centers, detections.class_id, detections.names)
+        if regions:
+            # Keeps the counted-ID sets (and checkpoints) bounded by the live tracks
+            active = set(self.tracker.ids.tolist())
+            for region in regions:
+                region.prune(active)
+        return self.totals()
+
+    def scale(self, factor):
+        # Regions are given in source pixels; match frames that were downscaled while decoding
+        for line in self.lines:
+            line.p1 = line.p1 * factor
+            line.p2 = line.p2 * factor
+        for zone in self.zones:
+            zone.polygon = zone.polygon * factor
+
+    def regions(self):
+        # Line and zone geometry, to check a saved state belongs to the same setup
+        return {'lines': [[line.name, line.p1.tolist(), line.p2.tolist()] for line in self.lines],
+                'zones': [[zone.name, zone.polygon.tolist()] for zone in self.zones]}
+
+    def state_dict(self):
+        # Plain lists and dicts, so it can be stored as JSON in a checkpoint
+        return {'tracker': self.tracker.state_dict(), 'unique': self.unique,
+                'lines': [line.state_dict() for line in self.lines],
+                'zones': [zone.state_dict() for zone in self.zones]}
+
+    def load_state_dict(self, state):
+        self.tracker.load_state_dict(state['tracker'])
+        self.unique = dict(state['unique'])
+        for region, region_state in zip(self.lines + self.zones, state['lines'] + state['zones']):
+            region.load_state_dict(region_state)
+
+    def totals(self):
+        totals = {'unique': dict(self.unique)}
+        for line in self.lines:
+            totals[f"{line.name} in"] = dict(line.totals['in'])
+            totals[f"{line.name} out"] = dict(line.totals['out'])
+        for zone in self.zones:
+            totals[zone.name] = dict(zone.totals)
+        return totals
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+YOLO_WEIGHT_URLS = {name: f"https://github.com/ultralytics/assets/releases/download/v0.0.0/{name}"
+                    for name in ("yolov8n.pt", "yolov8s.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt")}
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _copy_atomic(src, dest):
+    # Copy next to dest under a unique name, then rename, so dest is either missing or
+    # complete even when several processes fill the same shared directory
+    directory = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(dest) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def read_digests(path):
+    # {name: sha256} from a sha256sum-style file ("<hex>  <name>" per line)
+    digests = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    digests[parts[1].lstrip('*')] = parts[0]
+    except OSError:
+        pass
+    return digests
+
+class WeightManager:
+    # Fetches model weights into dest_dir. A weight is taken, in this order, from dest_dir
+    # itself, from a shared cache directory (e.g. a network share), from HTTP mirrors (base
+    # URLs serving such a directory) and finally from its own URL. Downloads use `connections`
+    # parallel ranged requests when the server supports them and keep a '.part' file plus a
+    # '.part.json' list of finished chunks, so an interrupted download continues where it
+    # stopped. The file only gets its final name after its size, sha256 (when known) and, for
+    # .pt files, zip structure are verified. Verified downloads are copied to the first cache
+    # directory together with a '<name>.sha256' file that later copies are checked against.
+    # Weights without a known sha256 are pinned in digest_file (default 'weights.sha256' in
+    # dest_dir) on their first verified fetch, and checked against it from then on.
+    def __init__(self, dest_dir, cache_dirs=(), mirrors=(), connections=4, chunk_size=8 * 1024 * 1024,
+                 timeout=30, retries=3, digest_file=None):
+        self.dest_dir = dest_dir
+        self.digest_file = digest_file or os.path.join(dest_dir, 'weights.sha256')
+        self.cache_dirs = [d for d in cache_dirs if d]
+        self.mirrors = [m.rstrip('/') for m in mirrors if m]
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+
+    def path(self, name):
+        return os.path.join(self.dest_dir, name)
+
+    def fetch(self, name, url=None, sha256=None, progress=None):
+        # Returns the path of the verified weight; progress(done_bytes, total_bytes) is called
+        # from download threads
+        dest = self.path(name)
+        sha256 = sha256 or read_digests(self.digest_file).get(name)
+        if os.path.isfile(dest) and self._valid(dest, sha256):
+            return dest
+        for cache_dir in self.cache_dirs:
+            cached = os.path.join(cache_dir, name)
+            expected = sha256 or self._cached_digest(cached)
+            if os.path.isfile(cached) and self._valid(cached, expected):
+                _copy_atomic(cached, dest)
+                self._pin(name, dest, sha256)
+                return dest
+        urls = [f"{mirror}/{name}" for mirror in self.mirrors] + ([url] if url else [])
+        if not urls:
+            raise FileNotFoundError(f"No cache, mirror or URL has {name}")
+        errors = []
+        for source in urls:
+            expected = sha256
+            if expected is None and source != url:
+                expected = self._remote_digest(source + '.sha256')
+            try:
+                self.download(source, dest, expected, progress)
+                break
+            except (OSError, ValueError) as e:
+                errors.append(f"{source}: {e}")
+        else:
+            raise IOError(f"Could not download {name}: " + "; ".join(errors))
+        self._store_in_cache(name, dest)
+        self._pin(name, dest, sha256)
+        return dest
+
+    def _pin(self, name, path, sha256=None):
+        # Record the digest of a weight accepted without a known one
+        if sha256 is not None:
+            return
+        digests = read_digests(self.digest_file)
+        digests[name] = sha256_file(path)
+        try:
+            directory = os.path.dirname(os.path.abspath(self.digest_file))
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.writelines(f"{digest}  {n}\n" for n, digest in sorted(digests.items()))
+            os.replace(tmp, self.digest_file)
+        except OSError:
+            pass  # a read-only weight directory is only used as is
+
+    def _cached_digest(self, path):
+        try:
+            with open(path + '.sha256') as f:
+                return f.read().split()[0]
+        except (OSError, IndexError):
+            return None
+
+    def _remote_digest(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as r:
+                return r.read(200).decode().split()[0]
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _store_in_cache(self, name, path):
+        if not self.cache_dirs:
+            return
+        cached = os.path.join(self.cache_dirs[0], name)
+        try:
+            if not os.path.exists(cached):
+                _copy_atomic(path, cached)
+            with open(cached + '.sha256', 'w') as f:
+                f.write(f"{sha256_file(cached)}  {name}\n")
+        except OSError:
+            pass  # a read-only share is only used as a source
+
+    def _valid(self, path, sha256=None, size=None):
+        if size is not None and os.path.getsize(path) != size:
+            return False
+        if sha256 is not None:
+            return sha256_file(path) == sha256
+        # Without a known hash, at least catch truncated PyTorch checkpoints (zip archives)
+        return not path.endswith('.pt') or zipfile.is_zipfile(path)
+
+    def _open(self, url, start=None, end=None):
+        request = urllib.request.Request(url)
+        if start is not None:
+            request.add_header('Range', f"bytes={start}-{end}")
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _probe(self, url):
+        # (size, accepts ranges) from a one-byte ranged request; size is None when unknown
+        with self._open(url, 0, 0) as r:
+            if r.status == 206:
+                content_range = r.headers.get('Content-Range', '')
+                total = content_range.rpartition('/')[2]
+                return (int(total), True) if total.isdigit() else (None, False)
+            length = r.headers.get('Content-Length')
+            return (int(length) if length else None), False
+
+    def download(self, url, dest, sha256=None, progress=None):
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        part, state_path = dest + '.part', dest + '.part.json'
+        size, ranged = self._probe(url)
+        if ranged and size:
+            self._download_ranged(url, part, state_path, size, progress)
+        else:
+            self._download_stream(url, part, size, progress)
+        if not self._valid(part, sha256, size):
+            # A corrupt result is not resumable
+            for p in (part, state_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            raise ValueError(f"Downloaded file failed verification: {url}")
+        os.replace(part, dest)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+    def _download_ranged(self, url, part, state_path, size, progress):
+        chunks = [(start, min(start + self.chunk_size, size) - 1) for start in range(0, size, self.chunk_size)]
+        done = set()
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state['url'] == url and state['size'] == size and state['chunk_size'] == self.chunk_size \
+                    and os.path.getsize(part) == size:
+                done = set(state['done'])
+        except (OSError, ValueError, KeyError):
+            pass
+        if not done:
+            with open(part, 'wb') as f:
+                f.truncate(size)
+        lock = threading.Lock()
+        downloaded = [sum(chunks[i][1] - chunks[i][0] + 1 for i in done)]
+
+        def save_state():
+            tmp = state_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'url': url, 'size': size, 'chunk_size': self.chunk_size, 'done': sorted(done)}, f)
+            os.replace(tmp, state_path)
+
+        def fetch_chunk(i):
+            start, end = chunks[i]
+            for attempt in range(self.retries):
+                try:
+                    with self._open(url, start, end) as r, open(part, 'r+b') as f:
+                        if r.status != 206:
+                            raise IOError(f"Server ignored the range request for {url}")
+                        f.seek(start)
+                        received = 0
+                        for data in iter(lambda: r.read(256 * 1024), b''):
+                            f.write(data)
+                            received += len(data)
+                        if received != end - start + 1:
+                            raise IOError(f"Short read for bytes {start}-{end} of {url}")
+                    break
+                except (OSError, urllib.error.URLError):
+                    if attempt == self.retries - 1:
+                        raise
+            with lock:
+                done.add(i)
+                save_state()
+                downloaded[0] += end - start + 1
+                if progress is not None:
+                    progress(downloaded[0], size)
+
+        save_state()
+        with ThreadPoolExecutor(self.connections) as pool:
+            for future in [pool.submit(fetch_chunk, i) for i in range(len(chunks)) if i not in done]:
+                future.result()
+
+    def _download_stream(self, url, part, size, progress):
+        # Servers without range support: a single request, restarted from scratch
+        with self._open(url) as r, open(part, 'wb') as f:
+            downloaded = 0
+            for data in iter(lambda: r.read(1024 * 1024), b''):
+                f.write(data)
+                downloaded += len(data)
+                if progress is not None:
+                    progress(downloaded, size or 0)